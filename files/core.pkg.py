@@ -4,6 +4,7 @@ contents = [
     "game_rules.py",
     "core/utilities.py",
     "core/generation.py",
+    "core/mapgen_support.py",
     "core/events.py",
     "core/resources.py",
     "core/consequences.py",
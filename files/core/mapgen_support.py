@@ -0,0 +1,687 @@
+# Infrastructure shared by all map generation scripts: the wrapper around the engine's generation object
+# (with profiling and map rejection), the generated sector cache, and the spatial index over generated signals.
+# Refinements themselves live with their modes (the standard ones in "modes/standard/mapgen.py").
+
+####################################
+# Logging
+
+GENERATION_LOGS = False
+def gen_log(*args):
+    if GENERATION_LOGS: log(*args)
+
+####################################
+# Profiling
+
+import time
+_clock = getattr(time, "perf_counter", None) or time.clock
+
+PROFILE_GENERATION = False
+_neighbor_queries = [0] # total count, bumped by the signal index and the profiled generation
+
+def generation_from(data):
+    """Grabs the map generation object from MapSetup data. Refinements registered through it
+    are skipped once the map gets rejected or restored from the sector cache, and with PROFILE_GENERATION on, every refinement
+    and rule gets timed and reported at the end of generation."""
+    gen = data["generation"]
+    profiler = GenerationProfiler.for_generation(gen) if PROFILE_GENERATION else None
+    return _GenerationSetup(gen, profiler)
+
+def unwrap_generation(gen):
+    return getattr(gen, "_wrapped_generation", gen)
+
+class GenerationProfiler:
+    """Collects wall time, neighbor query counts and mutated signal counts for every refinement
+    and rule of one generation pass, and logs them as a table once generation finishes."""
+    QUERY_METHODS = ["Neighbors", "CountNeighbors", "HasNeighbor", "ProportionAmongNeighbors",
+        "SignalsNear", "FindViableLoop", "FindExtensionForViableLoop"]
+    RULE_PHASES = {"SignalRule": "sizes", "NodeRule": "node_types", "PlanetRule": "planet_types"}
+    REPORT_PRIORITY = 1000000
+
+    _current = [None, None] # [generation, profiler]
+    @staticmethod
+    def for_generation(gen):
+        current_gen, profiler = GenerationProfiler._current
+        if current_gen is not gen:
+            profiler = GenerationProfiler(gen)
+            GenerationProfiler._current[0], GenerationProfiler._current[1] = gen, profiler
+        return profiler
+
+    def __init__(self, gen):
+        self._gen = gen
+        self._stats = {} # (phase, priority, name) -> [calls, seconds, queries, mutated]
+        self._reported = False
+        gen.Refinement("after_planet_types", self.REPORT_PRIORITY, self._report_refinement)
+
+    def counting(self, gen):
+        return _GenerationSetup(unwrap_generation(gen), self)
+
+    # --- wrapping
+
+    def wrap_refinement(self, phase, priority, fn):
+        key = (phase, priority, self._describe(fn))
+        def profiled(gen, signals, zones):
+            before = [(s, s.Contents, s.Size, s.Quirk) for s in signals]
+            queries_before, start = _neighbor_queries[0], _clock()
+            fn(self.counting(gen), signals, zones)
+            elapsed, queries = _clock() - start, _neighbor_queries[0] - queries_before
+            mutated = sum(1 for s, contents, size, quirk in before if s.Contents != contents or s.Size != size or s.Quirk != quirk)
+            self._record(key, elapsed, queries, mutated)
+        return profiled
+
+    def wrap_rule(self, kind, rule):
+        key = (self.RULE_PHASES[kind], 0, self._describe(rule))
+        def profiled(signal, tag, gen):
+            queries_before, start = _neighbor_queries[0], _clock()
+            result = rule(signal, tag, self.counting(gen))
+            self._record(key, _clock() - start, _neighbor_queries[0] - queries_before, 0)
+            return result
+        return profiled
+
+    def _record(self, key, elapsed, queries, mutated):
+        stats = self._stats.get(key, None)
+        if stats is None:
+            stats = self._stats[key] = [0, 0.0, 0, 0]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] += queries
+        stats[3] += mutated
+
+    @staticmethod
+    def _describe(fn):
+        func = getattr(fn, "__func__", fn)
+        code = getattr(func, "__code__", None)
+        name = getattr(func, "__name__", repr(fn))
+        if code is None: return name
+        filename = code.co_filename.replace("\\", "/").split("/")[-1]
+        return "%s (%s:%d)" % (name, filename, code.co_firstlineno)
+
+    # --- reporting
+
+    def _report_refinement(self, gen, signals, zones):
+        self.report("finished")
+
+    def report(self, outcome):
+        if self._reported: return
+        self._reported = True
+        phase_order = ["sizes", "after_sizes", "node_types", "after_node_types", "planet_types", "after_planet_types"]
+        def sort_key(item):
+            (phase, priority, name), _ = item
+            return (phase_order.index(phase) if phase in phase_order else len(phase_order), priority, name)
+        lines = ["Map generation profile (%s):" % outcome,
+            "%-18s %8s  %-50s %8s %10s %9s %8s" % ("phase", "priority", "refinement/rule", "calls", "time [ms]", "queries", "mutated")]
+        total_time = 0.0
+        for (phase, priority, name), (calls, seconds, queries, mutated) in sorted(self._stats.items(), key=sort_key):
+            lines.append("%-18s %8d  %-50s %8d %10.1f %9d %8d" % (phase, priority, name[:50], calls, seconds * 1000.0, queries, mutated))
+            total_time += seconds
+        lines.append("Total: %.1f ms" % (total_time * 1000.0))
+        log("\n".join(lines))
+
+class _GenerationSetup:
+    """Stands in for the generation object: refinements get guarded against running on a rejected
+    map, and when profiling, registrations get wrapped with the profiler and neighbor queries get
+    counted. Everything else is passed through."""
+    def __init__(self, gen, profiler):
+        self._wrapped_generation = gen
+        self._profiler = profiler
+
+    def Refinement(self, phase, priority, fn):
+        if self._profiler:
+            fn = self._profiler.wrap_refinement(phase, priority, fn)
+        self._wrapped_generation.Refinement(phase, priority, skip_if_rejected(fn))
+    def SignalRule(self, rule):
+        self._wrapped_generation.SignalRule(self._profiled_rule("SignalRule", rule))
+    def NodeRule(self, rule):
+        self._wrapped_generation.NodeRule(self._profiled_rule("NodeRule", rule))
+    def PlanetRule(self, rule):
+        self._wrapped_generation.PlanetRule(self._profiled_rule("PlanetRule", rule))
+    def _profiled_rule(self, kind, rule):
+        return self._profiler.wrap_rule(kind, rule) if self._profiler else rule
+
+    def RejectThisMap(self):
+        if self._profiler:
+            self._profiler.report("rejected")
+        self._wrapped_generation.RejectThisMap()
+
+    def __getattr__(self, name):
+        attr = getattr(self._wrapped_generation, name)
+        if self._profiler and name in GenerationProfiler.QUERY_METHODS:
+            def counted(*args):
+                _neighbor_queries[0] += 1
+                return attr(*args)
+            return counted
+        return attr
+
+####################################
+# Map rejection
+
+_rejected_generation = [None, None] # [generation, probe signal]
+
+def reject_map(gen, signals, reason):
+    """Rejects the map being generated. Refinements registered through generation_from() won't
+    run for this pass anymore, so cheap checks should reject as early as their inputs exist."""
+    gen_log("Map rejected: %s" % reason)
+    _rejected_generation[0], _rejected_generation[1] = unwrap_generation(gen), first(signals)
+    gen.RejectThisMap()
+
+def map_rejected(gen, signals):
+    rejected_gen, probe = _rejected_generation
+    # the probe tells a retry apart from the rejected pass, in case the generation object is reused
+    return rejected_gen is unwrap_generation(gen) and probe is first(signals)
+
+def skip_if_rejected(fn):
+    def guarded(gen, signals, zones):
+        if map_rejected(gen, signals) or GeneratedSectorCache.restoring(gen, signals): return
+        fn(gen, signals, zones)
+    return guarded
+
+def refinement_reject_if(reason, predicate):
+    """Rejection predicate: rejects the map if predicate(gen, signals, zones) returns true.
+    Register it in the earliest phase where everything it looks at is already final."""
+    def refine(gen, signals, zones):
+        if predicate(gen, signals, zones):
+            reject_map(gen, signals, reason)
+    return refine
+
+####################################
+# Generated sector cache
+
+import struct, binascii
+
+class GeneratedSectorCache:
+    """Keeps the final layouts of recently generated sectors in the player's selections, so going
+    back to a sector (or starting a run in it) restores the stored layout instead of re-running the
+    refinements. Entries are keyed by everything generation depends on, and the least recently used
+    ones are evicted. Only safe for setups whose refinements do nothing but change signals."""
+    CAPACITY = 24
+    INDEX_KEY = "sector_cache"
+    ENTRY_PREFIX = "sector_cache:"
+    FORMAT_VERSION = 1
+    VERIFY_PRIORITY = -1000000
+    FINISH_PRIORITY = GenerationProfiler.REPORT_PRIORITY - 1
+    HEADER = struct.Struct("<HII") # format version, string table length, signal count
+    RECORD = struct.Struct("<ffBHH") # x, y, size, contents, quirk (indices into the string table)
+    POSITION_PRECISION = 1000.0
+
+    _restoring = [None, None, None] # [generation, probe signal, decoded layout]
+
+    @classmethod
+    def attach(cls, gen):
+        key = cls.key_for_current_config()
+        if key is None: return
+        gen = unwrap_generation(gen)
+        stored = cls.load(key)
+        layout = cls.decode(stored) if stored else None
+        if layout is not None:
+            gen_log("Restoring sector layout from cache: %s" % key)
+            gen.Refinement("after_sizes", cls.VERIFY_PRIORITY, cls._verify_refinement(layout))
+            gen.Refinement("after_planet_types", cls.FINISH_PRIORITY, cls._restore_refinement)
+        else:
+            gen.Refinement("after_planet_types", cls.FINISH_PRIORITY, cls._store_refinement(key))
+
+    @staticmethod
+    def key_for_current_config():
+        cfg = game.GameConfig
+        sector = cfg.Sector
+        if sector is None: return None
+        mutators = sorted(str(getattr(m, "ID", m)) for m in cfg.AllConfiguredMutators())
+        return "%s/%d/%s/%s/%s" % (sector.Seed, sector.SeedVersion, cfg.Difficulty.ID, ",".join(mutators), cfg.ScriptsVersion)
+
+    @staticmethod
+    def position_key(x, y):
+        precision = GeneratedSectorCache.POSITION_PRECISION
+        return (int(round(x * precision)), int(round(y * precision)))
+
+    # --- generation passes
+
+    @classmethod
+    def restoring(cls, gen, signals):
+        restored_gen, probe, _ = cls._restoring
+        return restored_gen is unwrap_generation(gen) and probe is first(signals)
+
+    @classmethod
+    def _verify_refinement(cls, layout):
+        def refine(gen, signals, zones):
+            # the signal positions come from the engine, so a stale entry shows up as a mismatch here
+            present = set(cls.position_key(s.Position.x, s.Position.y) for s in signals)
+            if any(k not in present for k in layout):
+                log("Cached sector layout doesn't match the generated signals, regenerating.")
+                return
+            cls._restoring[0], cls._restoring[1], cls._restoring[2] = unwrap_generation(gen), first(signals), layout
+        return refine
+
+    @classmethod
+    def _restore_refinement(cls, gen, signals, zones):
+        if not cls.restoring(gen, signals): return
+        layout = cls._restoring[2]
+        cls._restoring[0], cls._restoring[1], cls._restoring[2] = None, None, None
+        removed = []
+        for s in signals:
+            stored = layout.get(cls.position_key(s.Position.x, s.Position.y), None)
+            if stored is None:
+                removed.append(s)
+                continue
+            s.Size, s.Contents, s.Quirk = stored
+        if removed:
+            remove_generated_signals(gen, removed)
+
+    @classmethod
+    def _store_refinement(cls, key):
+        def refine(gen, signals, zones):
+            if map_rejected(gen, signals): return
+            cls.store(key, cls.encode(signals))
+        return refine
+
+    # --- encoding
+
+    @classmethod
+    def encode(cls, signals):
+        sizes = [PotentialSize.Small, PotentialSize.Medium, PotentialSize.Big]
+        strings, string_ids = [], {}
+        def string_id(text):
+            text = text or ""
+            if text not in string_ids:
+                string_ids[text] = len(strings)
+                strings.append(text)
+            return string_ids[text]
+        records = [cls.RECORD.pack(s.Position.x, s.Position.y, sizes.index(s.Size), string_id(s.Contents), string_id(s.Quirk))
+            for s in signals]
+        string_table = "\n".join(strings).encode("utf-8")
+        payload = cls.HEADER.pack(cls.FORMAT_VERSION, len(string_table), len(records)) + string_table + b"".join(records)
+        return binascii.b2a_base64(payload).decode("ascii")
+
+    @classmethod
+    def decode(cls, stored):
+        """Returns {position key: (size, contents, quirk)}, or None if the entry is unreadable."""
+        sizes = [PotentialSize.Small, PotentialSize.Medium, PotentialSize.Big]
+        try:
+            payload = binascii.a2b_base64(stored)
+            version, table_length, count = cls.HEADER.unpack_from(payload, 0)
+            if version != cls.FORMAT_VERSION: return None
+            offset = cls.HEADER.size
+            strings = payload[offset:offset + table_length].decode("utf-8").split("\n")
+            offset += table_length
+            layout = {}
+            for i in range(count):
+                x, y, size, contents, quirk = cls.RECORD.unpack_from(payload, offset + i * cls.RECORD.size)
+                layout[cls.position_key(x, y)] = (sizes[size], strings[contents], strings[quirk] or None)
+            return layout
+        except (ValueError, IndexError, struct.error, binascii.Error):
+            return None
+
+    # --- storage
+
+    @classmethod
+    def load(cls, key):
+        recent = list(game.Selections.GetObject(cls.INDEX_KEY, None) or [])
+        if key not in recent: return None
+        recent.remove(key)
+        recent.append(key)
+        game.Selections.SetObject(cls.INDEX_KEY, recent)
+        return game.Selections.GetObject(cls.ENTRY_PREFIX + key, None)
+
+    @classmethod
+    def store(cls, key, encoded):
+        recent = [k for k in (game.Selections.GetObject(cls.INDEX_KEY, None) or []) if k != key]
+        recent.append(key)
+        while len(recent) > cls.CAPACITY:
+            game.Selections.SetObject(cls.ENTRY_PREFIX + recent.pop(0), None)
+        game.Selections.SetObject(cls.ENTRY_PREFIX + key, encoded)
+        game.Selections.SetObject(cls.INDEX_KEY, recent)
+        game.Selections.SaveToDisk()
+
+####################################
+# Spatial index for neighbor queries
+
+class SignalIndex:
+    """Uniform grid over the signals of one generation pass. Within each cell, signals are
+    bucketed by their contents, so queries filtered by a tag prefix ("planet.", "nothing", ...)
+    never look at unrelated signals. Positions never change during generation, but contents do -
+    changes have to go through set_contents()/set_size() (or be reported with update()) to keep
+    the buckets in sync."""
+    CELL_SIZE = 1.0
+    WHOLE_MAP_RADIUS = 1000.0
+    MAX_OUTSTANDING = 64
+
+    def __init__(self, signals, cell_size = None):
+        self._cell_size = cell_size or self.CELL_SIZE
+        self._inv_cell_size = 1.0 / self._cell_size
+        self._cells = {} # (cx, cy) -> {contents: [signals]}
+        self._entries = {} # signal -> (x, y, cell, contents)
+        self._prefix_cache = {} # prefix -> list of matching contents
+        self._known_contents = set()
+        self._tallies = {} # radius -> NeighborhoodTally
+        self._rule_phase, self._last_observed = None, None
+        self._outstanding = {} # signal -> contents when it was scored
+        self._overflow_at = self.MAX_OUTSTANDING
+        for s in signals:
+            self.add(s)
+
+    # --- maintenance
+
+    def _cell_of(self, x, y):
+        inv = self._inv_cell_size
+        return (int(math.floor(x * inv)), int(math.floor(y * inv)))
+
+    def add(self, signal):
+        pos = signal.Position
+        x, y = pos.x, pos.y
+        cell = self._cell_of(x, y)
+        contents = signal.Contents
+        self._entries[signal] = (x, y, cell, contents)
+        self._bucket(cell, contents).append(signal)
+        self._tallies = {}
+
+    def remove(self, signal):
+        entry = self._entries.pop(signal, None)
+        if entry is None: return
+        _, _, cell, contents = entry
+        self._cells[cell][contents].remove(signal)
+        self._outstanding.pop(signal, None)
+        for tally in self._tallies.values():
+            tally.removed(signal, contents)
+
+    def update(self, signal):
+        """Re-buckets a signal after its contents were changed from outside the index."""
+        entry = self._entries.get(signal, None)
+        if entry is None: return
+        x, y, cell, old_contents = entry
+        new_contents = signal.Contents
+        if new_contents == old_contents: return
+        self._cells[cell][old_contents].remove(signal)
+        self._bucket(cell, new_contents).append(signal)
+        self._entries[signal] = (x, y, cell, new_contents)
+        for tally in self._tallies.values():
+            tally.changed(signal, old_contents, new_contents)
+
+    def set_contents(self, signal, contents):
+        signal.Contents = contents
+        self.update(signal)
+
+    def set_size(self, signal, size, contents):
+        signal.Size = size
+        self.set_contents(signal, contents)
+
+    def resync(self, signals = None):
+        """Re-buckets every signal whose contents changed - the engine assigns contents in bulk
+        between generation phases, without going through the index. Given the signals currently
+        on the map, also drops the ones removed without going through remove_generated_signals()."""
+        if signals is not None:
+            present = set(signals)
+            for signal in [s for s in self._entries if s not in present]:
+                self.remove(signal)
+        for signal in list(self._entries.keys()):
+            self.update(signal)
+
+    def observe(self, signal, phase):
+        """Called by rules before scoring a signal. The engine assigns contents one signal at a
+        time without telling the index, so the signals scored before this one get re-checked
+        (usually just the previous one). The first call in a new rule phase resyncs everything."""
+        if phase != self._rule_phase:
+            self._rule_phase, self._last_observed = phase, None
+            self._outstanding.clear()
+            self._overflow_at = self.MAX_OUTSTANDING
+            self.resync()
+        if signal is self._last_observed: return
+        self._last_observed = signal
+        outstanding = self._outstanding
+        assigned = [s for s, scored_as in outstanding.items() if s.Contents != scored_as]
+        for s in assigned:
+            del outstanding[s]
+        if len(outstanding) > self._overflow_at:
+            # the engine doesn't assign the way we expect, fall back to checking everything - the
+            # signals still waiting for contents stay tracked, and the limit grows so this stays rare
+            self.resync()
+            self._overflow_at = max(self.MAX_OUTSTANDING, 2 * len(outstanding))
+        else:
+            for s in assigned:
+                self.update(s)
+        if signal not in outstanding:
+            outstanding[signal] = signal.Contents
+
+    def tally(self, radius):
+        """The NeighborhoodTally for the given radius, built on first use."""
+        tally = self._tallies.get(radius, None)
+        if tally is None:
+            tally = self._tallies[radius] = NeighborhoodTally(self, radius)
+        return tally
+
+    def contains(self, signal):
+        return signal in self._entries
+
+    def coordinates(self, signal):
+        """The (x, y) position of a signal, without going through Vector2."""
+        x, y, _, _ = self._entries[signal]
+        return x, y
+
+    def _bucket(self, cell, contents):
+        buckets = self._cells.get(cell, None)
+        if buckets is None:
+            buckets = self._cells[cell] = {}
+        bucket = buckets.get(contents, None)
+        if bucket is None:
+            bucket = buckets[contents] = []
+        if contents not in self._known_contents:
+            self._known_contents.add(contents)
+            self._prefix_cache = {}
+        return bucket
+
+    def _contents_matching(self, prefix):
+        matching = self._prefix_cache.get(prefix, None)
+        if matching is None:
+            matching = [c for c in self._known_contents if c.startswith(prefix)]
+            self._prefix_cache[prefix] = matching
+        return matching
+
+    # --- queries
+
+    def _query(self, x, y, radius, prefix, live, excluded):
+        """Yields (signal, squared distance) for all signals within the radius. With live=True,
+        the prefix is checked against the current contents instead of the recorded bucket - used
+        by rules, which run while the engine itself is still assigning contents."""
+        _neighbor_queries[0] += 1
+        radius_sq = radius * radius
+        min_cx, min_cy = self._cell_of(x - radius, y - radius)
+        max_cx, max_cy = self._cell_of(x + radius, y + radius)
+        bucketed = prefix is not None and not live
+        matching = self._contents_matching(prefix) if bucketed else None
+        entries, cells = self._entries, self._cells
+        for cx in xrange(min_cx, max_cx + 1):
+            for cy in xrange(min_cy, max_cy + 1):
+                buckets = cells.get((cx, cy), None)
+                if buckets is None: continue
+                if bucketed:
+                    lists = [buckets[c] for c in matching if c in buckets]
+                else:
+                    lists = buckets.values()
+                for signals in lists:
+                    for s in signals:
+                        if s is excluded: continue
+                        sx, sy, _, _ = entries[s]
+                        dx, dy = sx - x, sy - y
+                        dist_sq = dx * dx + dy * dy
+                        if dist_sq > radius_sq: continue
+                        if live and prefix is not None and not s.Contents.startswith(prefix): continue
+                        yield s, dist_sq
+
+
+    def near(self, point, radius, prefix = None, live = False):
+        """All signals within the radius from a point, optionally filtered by contents prefix."""
+        return [s for s, _ in self._query(point.x, point.y, radius, prefix, live, None)]
+
+    def neighbors(self, signal, radius, prefix = None, live = False):
+        """All signals within the radius from another signal (excluding itself)."""
+        x, y, _, _ = self._entries[signal]
+        return [s for s, _ in self._query(x, y, radius, prefix, live, signal)]
+
+    def count_neighbors(self, signal, radius, prefix = None, live = False):
+        x, y, _, _ = self._entries[signal]
+        return sum(1 for _ in self._query(x, y, radius, prefix, live, signal))
+
+    def has_neighbor(self, signal, radius, prefix = None, live = False):
+        x, y, _, _ = self._entries[signal]
+        return any(True for _ in self._query(x, y, radius, prefix, live, signal))
+
+    def neighbors_with_distances(self, signal, radius, prefix = None, live = False):
+        """Like neighbors(), but returns (signal, squared distance) pairs."""
+        x, y, _, _ = self._entries[signal]
+        return list(self._query(x, y, radius, prefix, live, signal))
+
+    def nearest_distances_sq(self, signals, max_distance, prefix = None):
+        """Batch nearest-neighbor search: {signal: squared distance to the closest other signal
+        matching the prefix}, capped at max_distance squared. Each search goes outwards ring by
+        ring and stops as soon as no closer signal can exist, so crowded signals only look at a
+        few cells."""
+        _neighbor_queries[0] += 1
+        cell_size, cells, entries = self._cell_size, self._cells, self._entries
+        matching = self._contents_matching(prefix) if prefix is not None else None
+        max_ring = int(math.ceil(max_distance * self._inv_cell_size))
+        cap_sq = max_distance * max_distance
+        result = {}
+        for signal in signals:
+            x, y, (cx, cy), _ = entries[signal]
+            best_sq = cap_sq
+            for ring in xrange(max_ring + 1):
+                gap = (ring - 1) * cell_size # anything in this ring is at least this far away
+                if gap > 0 and gap * gap >= best_sq: break
+                for cell in self._ring_cells(cx, cy, ring):
+                    buckets = cells.get(cell, None)
+                    if buckets is None: continue
+                    for contents, bucket in buckets.items():
+                        if matching is not None and contents not in matching: continue
+                        for s in bucket:
+                            if s is signal: continue
+                            sx, sy, _, _ = entries[s]
+                            dx, dy = sx - x, sy - y
+                            dist_sq = dx * dx + dy * dy
+                            if dist_sq < best_sq:
+                                best_sq = dist_sq
+            result[signal] = best_sq
+        return result
+
+    def margins_to_circles(self, centers, radii, max_margin, prefix = None):
+        """Sweep over a chain of circles (e.g. the subdivided points of a rip): returns
+        {signal: min over all circles of (distance to center - radius)} for every signal with a
+        margin of at most max_margin. Each grid cell is visited once, and its signals are only
+        measured against the circles that reach into it."""
+        _neighbor_queries[0] += 1
+        circles_in_cell = {}
+        for i, (center, radius) in enumerate(zip(centers, radii)):
+            reach = radius + max_margin
+            min_cx, min_cy = self._cell_of(center.x - reach, center.y - reach)
+            max_cx, max_cy = self._cell_of(center.x + reach, center.y + reach)
+            for cx in xrange(min_cx, max_cx + 1):
+                for cy in xrange(min_cy, max_cy + 1):
+                    if (cx, cy) not in self._cells: continue
+                    circles_in_cell.setdefault((cx, cy), []).append((center.x, center.y, radius))
+        matching = self._contents_matching(prefix) if prefix is not None else None
+        entries, margins = self._entries, {}
+        for cell, circles in circles_in_cell.items():
+            for contents, bucket in self._cells[cell].items():
+                if matching is not None and contents not in matching: continue
+                for s in bucket:
+                    sx, sy, _, _ = entries[s]
+                    margin = min(math.sqrt((sx - x) * (sx - x) + (sy - y) * (sy - y)) - r for x, y, r in circles)
+                    if margin <= max_margin:
+                        margins[s] = margin
+        return margins
+
+    @staticmethod
+    def _ring_cells(cx, cy, ring):
+        if ring == 0:
+            return [(cx, cy)]
+        ring_cells = []
+        for dx in xrange(-ring, ring + 1):
+            ring_cells.append((cx + dx, cy - ring))
+            ring_cells.append((cx + dx, cy + ring))
+        for dy in xrange(-ring + 1, ring):
+            ring_cells.append((cx - ring, cy + dy))
+            ring_cells.append((cx + ring, cy + dy))
+        return ring_cells
+
+class NeighborhoodTally:
+    """Per-signal counts of neighbor contents within a fixed radius, kept up to date by the
+    SignalIndex as contents change. Lets rules read their neighborhood in constant time instead
+    of running a query for every candidate tag."""
+    def __init__(self, index, radius):
+        self._neighbors = {} # signal -> neighbors within radius
+        self._counts = {} # signal -> {contents: count}
+        self._weighted = {} # id(weights) -> (weights, {signal: weighted sum})
+        entries = index._entries
+        for s in entries:
+            neighbors = self._neighbors[s] = index.neighbors(s, radius)
+            counts = self._counts[s] = {}
+            for n in neighbors:
+                contents = entries[n][3]
+                counts[contents] = counts.get(contents, 0) + 1
+
+    def total(self, signal):
+        return len(self._neighbors[signal])
+
+    def count(self, signal, contents):
+        return self._counts[signal].get(contents, 0)
+
+    def weighted_sum(self, signal, weights):
+        """Sum of weights[contents] over the neighbors (contents without a weight count as 0)."""
+        tracked = self._weighted.get(id(weights), None)
+        if tracked is None:
+            sums = dict((s, sum(weights.get(c, 0) * k for c, k in counts.items())) for s, counts in self._counts.items())
+            tracked = self._weighted[id(weights)] = (weights, sums)
+        return tracked[1][signal]
+
+    def changed(self, signal, old_contents, new_contents):
+        for n in self._neighbors[signal]:
+            counts = self._counts[n]
+            counts[old_contents] -= 1
+            counts[new_contents] = counts.get(new_contents, 0) + 1
+        for weights, sums in self._weighted.values():
+            delta = weights.get(new_contents, 0) - weights.get(old_contents, 0)
+            if delta == 0: continue
+            for n in self._neighbors[signal]:
+                sums[n] += delta
+
+    def removed(self, signal, contents):
+        for n in self._neighbors.pop(signal):
+            self._neighbors[n].remove(signal)
+            self._counts[n][contents] -= 1
+            for weights, sums in self._weighted.values():
+                sums[n] -= weights.get(contents, 0)
+        del self._counts[signal]
+        for _, sums in self._weighted.values():
+            del sums[signal]
+
+_current_signal_index = [None, None] # [generation, index]
+def signal_index(gen, signals = None, probe = None):
+    """Returns the SignalIndex for the current generation pass, building it on first use.
+    A new pass is detected either by a different generation object, or by the index not
+    knowing the probe signal (by default, the first of the signals passed in).
+    Refinements pass in their signals, which also resyncs the contents assigned by the engine
+    since the last refinement ran, and drops signals removed directly from the generation. Rules only pass a probe, and query with live=True instead."""
+    gen = unwrap_generation(gen)
+    cached_gen, index = _current_signal_index
+    if probe is None and signals is not None:
+        probe = first(signals)
+    if cached_gen is gen and index is not None and (probe is None or index.contains(probe)):
+        if signals is not None:
+            index.resync(signals)
+        return index
+    if signals is None:
+        signals = gen.SignalsNear(Vector2.zero, SignalIndex.WHOLE_MAP_RADIUS)
+    index = SignalIndex(signals)
+    _current_signal_index[0], _current_signal_index[1] = gen, index
+    return index
+
+def neighborhood_tally(gen, signal, radius, phase):
+    """For rules: the NeighborhoodTally of the current pass, synced up to the signal being scored."""
+    index = signal_index(gen, probe=signal)
+    index.observe(signal, phase)
+    return index.tally(radius)
+
+def remove_generated_signals(gen, signals):
+    """Removes signals from the map, keeping the signal index in sync."""
+    signals = list(signals)
+    gen = unwrap_generation(gen)
+    index = _current_signal_index[1] if _current_signal_index[0] is gen else None
+    if index is not None:
+        for s in signals:
+            index.remove(s)
+    gen.RemoveSignals(signals)
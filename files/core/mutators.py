@@ -501,7 +501,7 @@ class MapGenGuaranteePlanets(GlobalCondition):
     def activate(self):
         self.react_to(Trigger.MapSetup, self.on_map_setup)
     def on_map_setup(self, data):
-        map_generation = data["generation"]
+        map_generation = generation_from(data)
         map_generation.Refinement("after_planet_types", 600, self.refinement_replace_some_planets)
 
     def refinement_replace_some_planets(self, gen, signals, zones):
@@ -544,7 +544,7 @@ class MapGenReducePlanets(GlobalCondition):
     def activate(self):
         self.react_to(Trigger.MapSetup, self.on_map_setup)
     def on_map_setup(self, data):
-        map_generation = data["generation"]
+        map_generation = generation_from(data)
         map_generation.Refinement("after_planet_types", 610, self.refinement_replace_some_planets)
 
     def refinement_replace_some_planets(self, gen, signals, zones):
@@ -1078,7 +1078,7 @@ class MapGenOnlyMedium(GlobalCondition):
         self.react_to(Trigger.MapSetup, self.on_map_setup)
 
     def on_map_setup(self, data):
-        map_generation = data["generation"]
+        map_generation = generation_from(data)
         map_generation.Refinement("after_planet_types", 2000, self.refinement_signal_size)
 
     def refinement_signal_size(self, gen, signals, zones):
@@ -235,7 +235,7 @@ class StandardPlanetQuirks(GlobalCondition):
         self.react_to(Trigger.MapSetup, self.on_map_setup)
 
     def on_map_setup(self, data):
-        map_generation = data["generation"]
+        map_generation = generation_from(data)
         # generate rips     
         map_generation.Refinement("after_planet_types", 2000, self.refinement_add_some_quirks)
 
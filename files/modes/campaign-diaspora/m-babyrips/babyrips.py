@@ -194,7 +194,7 @@ class BabyRipsMissionMapgen(GlobalCondition):
         RipManager.CreateIfNeeded(world)
 
     def on_map_setup(self, data):
-        map_generation = data["generation"]
+        map_generation = generation_from(data)
         # add rips during mapgen
         diff = difficulty_ordinal()
         count = [45, 52, 60, 60][diff]
@@ -18,6 +18,8 @@ class BaqarMainMission(OneRaceMainMission):
         (WinMissionOnTime, "BaqarMainMission()", 28),
         ManageGrowth,
         EatSignalsOnDiscovery,
+        TrackHoleSlipways,
+        PylonObstacles,
         SealTime,
         WallContainment,
         BuildOnlyInside,
@@ -287,10 +289,7 @@ def possible_pylon_connections(position, pylon_node = None):
         if free_slots <= 0: break
         if other in indirectly_connected: continue
         # obstructed?
-        segment = CollidingSegment(position, other.Position)
-        obstructions = list(o for o in Obstruction.CheckForObstructionsNow(world, pylon_node, segment) if o.Owner != other)
-        filtered_obstructions = [o for o in obstructions if obstructs_pylon_connections(o.Owner, segment)]
-        if len(filtered_obstructions) > 0: continue
+        if pylon_connection_obstructed(position, other, pylon_node): continue
         # nope, everything works
         pylons_to_connect_to.append(other)
         indirectly_connected.add(other)
@@ -605,6 +604,7 @@ class ManageGrowth(GlobalCondition):
         self._unprotected_growth = constants.Float("hole.unprotected_growth")
         self._growth_increase = constants.Float("hole.growth_increase_per_year")
         self._historical_influence = []
+        self._wall_distances = WallDistanceField(5, 0.25)
 
     def activate(self):
         self._hole = None
@@ -647,6 +647,7 @@ class ManageGrowth(GlobalCondition):
         how_much = how_much * f(slow_down)
         history = self.hole().CustomData.GetOr("historical_wall_influence", None)
         history = list(history) if history else [1.0] * point_count # fresh copy
+        self._wall_distances.refresh()
         while retries > 0:
             retries -= 1
             points = list(original_points)
@@ -716,31 +717,16 @@ class ManageGrowth(GlobalCondition):
                 return points
         raise Exception("Unable to grow.")
 
-    wall_checks = set()
     def wall_influence(self, point):
-        wall_checks = self.wall_checks
-        wall_checks.clear()
-        dist_sq = 100
-        for node in game.Nodes.Within(point, f(6)):
-            if node.NodeType == "structure.rift_wall":
-                n = node
-                if not n in wall_checks:
-                    wall_checks.add(n)
-                    ends = wall_end_positions(n)
-                    d = Intersecting.DistancePointToSegmentSquared(point, ends[0], ends[1])
-                    if d < dist_sq:
-                        dist_sq = d
-            elif node.NodeType == "structure.powered_pylon":
-                for n in pylon_walls(node):
-                    if not n in wall_checks:
-                        wall_checks.add(n)
-                        ends = wall_end_positions(n)
-                        d = Intersecting.DistancePointToSegmentSquared(point, ends[0], ends[1])
-                        if d < dist_sq:
-                            dist_sq = d
-        if dist_sq <= 1: return 0.0
-        if dist_sq >= 25: return 1.0
-        return inverse_lerp_clamped(1, 5, math.sqrt(dist_sq))
+        distance = self._wall_distances.distance(point)
+        if distance <= 1: return 0.0
+        if distance >= 5: return 1.0
+        return inverse_lerp_clamped(1, 5, distance)
+
+    def current_wall_influence(self, point):
+        """wall_influence() for use outside growth calculations, with the wall distances brought up to date first."""
+        self._wall_distances.refresh()
+        return self.wall_influence(point)
 
     def recalculate(self):
         growth = self.calculate_growth(self.hole().Points, self.growth_speed())
@@ -762,7 +748,7 @@ class BMDebugging(GlobalCondition):
     
     def wall_at(self, position):
         mg = conditions.Get("ManageGrowth()").PythonObject
-        log("Wall influence at %s -> %f" % (position, mg.wall_influence(position)))
+        log("Wall influence at %s -> %f" % (position, mg.current_wall_influence(position)))
 
 ############################################################################
 # Hole generation
@@ -772,7 +758,7 @@ class HoleMapgen(GlobalCondition):
         self.react_to(Trigger.MapSetup, self.on_map_setup)
         self.react_to(Trigger.MapGenerated, self.on_map_generated)
     def on_map_setup(self, data):
-        gen = data["generation"]
+        gen = generation_from(data)
         game.CustomData.Set("hole_position", Vector2.zero)
         hole_size = constants.Float("accessible_space.radius") * constants.Float("distance.scale")
         gen.Refinement("after_planet_types", 1000, refinement_generate_hole(Vector2(hole_size, hole_size), 1.25))
@@ -790,6 +776,40 @@ def instantiate_hole():
 ####################################################
 # Containment
 
+import bisect
+
+class WallInterior:
+    """Inside/outside test for the closed wall loop. The loop is cut into horizontal slabs at its
+    vertices, each slab remembering only the edges that cross it, so a test only has to look at
+    a handful of edges. Answers are also remembered per position, since the same nodes (and the
+    same hovered position) get asked about over and over until the wall changes."""
+    MAX_REMEMBERED = 1024
+
+    def __init__(self, points):
+        self._ys = sorted(set(p.y for p in points))
+        # non-horizontal edges as (x at y0, y0, y1, dx/dy)
+        edges = [(a.x, a.y, b.y, (b.x - a.x) / (b.y - a.y)) for a, b in zip(points, points[1:]) if a.y != b.y]
+        self._slabs = []
+        for lo, hi in zip(self._ys, self._ys[1:]):
+            self._slabs.append([e for e in edges if min(e[1], e[2]) <= lo and max(e[1], e[2]) >= hi])
+        self._known = {}
+
+    def contains(self, pt):
+        key = (pt.x, pt.y)
+        inside = self._known.get(key)
+        if inside is None:
+            if len(self._known) >= self.MAX_REMEMBERED:
+                self._known = {}
+            inside = self._known[key] = self._classify(pt.x, pt.y)
+        return inside
+
+    def _classify(self, x, y):
+        ys = self._ys
+        if not ys or y < ys[0] or y >= ys[-1]: return False
+        slab = self._slabs[bisect.bisect_right(ys, y) - 1]
+        crossings = sum(1 for x0, y0, y1, slope in slab if x0 + (y - y0) * slope < x)
+        return crossings % 2 == 1
+
 class WallContainment(GlobalCondition):
     def activate(self):
         self._poly = None
@@ -806,14 +826,14 @@ class WallContainment(GlobalCondition):
         if not self._poly: return
         n = data["node"]
         if not n.NodeType.startswith("planet."): return
-        n.CustomData.Set("inside", self._poly.ContainsPoint(n.Position))
+        n.CustomData.Set("inside", self._poly.contains(n.Position))
 
     def wall_exists(self):
         return self._poly is not None
 
     def is_inside_wall(self, pt):
         if not self._poly: return False
-        return self._poly.ContainsPoint(pt)
+        return self._poly.contains(pt)
 
     def perform_check(self, start_pylon):
         # already done?
@@ -851,8 +871,7 @@ class WallContainment(GlobalCondition):
         # ok, we have a loop!
         points = [v.Position for v in visited_in_order]
         points.append(points[0]) # close loop
-        poly = CollidingPolygon(points)
-        return poly
+        return WallInterior(points)
 
 class ConsEstablishPoly:
     def __init__(self, containment, poly):
@@ -871,7 +890,7 @@ class ConsEstablishPoly:
     
     def assign_planet_information(self, update):
         for p in every(Planet):
-            inside = self._poly.ContainsPoint(p.Position)
+            inside = self._poly.contains(p.Position)
             update.add(p, "inside", inside)
 
     def lose_game_if_anything_outside(self):
@@ -881,7 +900,7 @@ class ConsEstablishPoly:
             return node.HasIndustry and not node.Industry.Kind.IsHidden            
         for n in every(Node):
             if not node_checked(n): continue
-            if not self._poly.ContainsPoint(n.Position):
+            if not self._poly.contains(n.Position):
                 commands.IssueScriptedConsequence(LoseForStuffOutside(n))
                 return
 
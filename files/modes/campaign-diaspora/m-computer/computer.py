@@ -7,7 +7,7 @@ class ComputerMapgen(GlobalCondition):
         self.react_to(Trigger.MapSetup, self.on_map_setup)
 
     def on_map_setup(self, data):
-        map_generation = data["generation"]
+        map_generation = generation_from(data)
         # add the computer structure
         map_generation.Refinement("after_node_types", 1000, refinement_place("structure.computer", (2.2, 2.5), PotentialSize.Medium))
 
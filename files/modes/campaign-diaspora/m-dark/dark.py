@@ -174,9 +174,12 @@ class DarkMapgen(GlobalCondition):
         self.react_to(Trigger.MapSetup, self.on_map_setup)
 
     def on_map_setup(self, data):
-        generation = data["generation"]
+        generation = generation_from(data)
         generation.Refinement("after_node_types", 800, self.refinement_sprinkle_anomalies())
-        generation.Refinement("after_planet_types", 900, self.reject_if_starting_position_bad())
+        # after node types, only the loop guarantee can still add a planet (at most one), so a start
+        # short by more than that is hopeless already
+        generation.Refinement("after_node_types", 900, refinement_reject_if("not enough starting planets", self.too_few_starting_planets))
+        generation.Refinement("after_planet_types", 900, refinement_reject_if("bad starting position", self.starting_position_bad))
 
     def generate_anomaly_positions(self):
         d_setup = Randomness.Pick(self._rng, self.DISTANCE_SETUPS)
@@ -209,15 +212,19 @@ class DarkMapgen(GlobalCondition):
                     break
         return refine
 
-    def reject_if_starting_position_bad(self):
-        bad_planets = ["planet.ice", "planet.barren", "planet.lava"]
-        def refine(gen, signals, zones):
-            visible = gen.SignalsNear(Vector2.zero, 2.13)
-            good_planets = sum(1 for p in visible if p.Contents.startswith("planet.") and p.Contents not in bad_planets)
-            log("Good planets: %d" % good_planets)
-            if good_planets < 6:
-                gen.RejectThisMap()
-        return refine
+    STARTING_RADIUS, MIN_GOOD_PLANETS = 2.13, 6
+    BAD_PLANETS = ["planet.ice", "planet.barren", "planet.lava"]
+
+    def too_few_starting_planets(self, gen, signals, zones):
+        visible = gen.SignalsNear(Vector2.zero, self.STARTING_RADIUS)
+        planets_to_come = 1 # refinement_ensure_loop may turn one more signal into a planet
+        return sum(1 for p in visible if p.Contents.startswith("planet.")) + planets_to_come < self.MIN_GOOD_PLANETS
+
+    def starting_position_bad(self, gen, signals, zones):
+        visible = gen.SignalsNear(Vector2.zero, self.STARTING_RADIUS)
+        good_planets = sum(1 for p in visible if p.Contents.startswith("planet.") and p.Contents not in self.BAD_PLANETS)
+        log("Good planets: %d" % good_planets)
+        return good_planets < self.MIN_GOOD_PLANETS
 
 #########################################################
 # View
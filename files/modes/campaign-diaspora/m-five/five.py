@@ -121,7 +121,7 @@ class ArchiveMapgen(GlobalCondition):
         self.react_to(Trigger.MapSetup, self.on_map_setup)
         self.react_to(Trigger.MapGenerated, self.on_map_generated)
     def on_map_setup(self, data):
-        gen = data["generation"]
+        gen = generation_from(data)
         gen.Refinement("after_planet_types", 1000, refinement_place_archive(3.5, 0.7))
     def on_map_generated(self, data):
         instantiate_archive_stuff()
@@ -148,7 +148,7 @@ def refinement_place_archive(desired_distance, eradication_distance):
         best_point = max(points, key=lambda p: p[1])[0]
         # eradicate surrounding signals that are too close
         removed_sigs = list(gen.SignalsNear(best_point, eradication_distance))
-        gen.RemoveSignals(removed_sigs)
+        remove_generated_signals(gen, removed_sigs)
         # find nearby planets
         range = 1.65
         while True:
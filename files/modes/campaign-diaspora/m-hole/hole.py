@@ -20,6 +20,8 @@ class HoleMainMission(MainMission):
         (HoleMusic,),
         (CheckContainment,),
         (EatSignalsOnDiscovery,),
+        (TrackHoleSlipways,),
+        (PylonObstacles,),
         (RehostPylonsOnColonization,),
         (WinMissionOnTime, "HoleMainMission()", 25),
     ]
@@ -152,6 +154,7 @@ class ManageGrowth(GlobalCondition):
     def __init__(self):
         self._base_growth = constants.Float("hole.starting_growth")
         self._growth_increment = constants.Float("hole.yearly_increment")
+        self._wall_distances = WallDistanceField(2, 0.125)
 
     def activate(self):
         self._hole = None
@@ -180,6 +183,7 @@ class ManageGrowth(GlobalCondition):
         how_much = f(how_much)
         retries = 50
         pos = self.hole().Position
+        self._wall_distances.refresh()
         while retries > 0:
             retries -= 1
             points = list(original_points)
@@ -234,14 +238,7 @@ class ManageGrowth(GlobalCondition):
         raise Exception("Unable to grow.")
 
     def wall_influence(self, point):
-        def distance_to_wall(w):
-            ends = wall_end_positions(w)
-            return Intersecting.DistancePointToSegmentSquared(point, ends[0], ends[1])
-        closest_wall = game.Nodes.ClosestOfType(point, "structure.rift_wall", f(4.25), distance_to_wall)
-        distance_to_wall = 2
-        if closest_wall:
-            ends = wall_end_positions(closest_wall)
-            distance_to_wall = Intersecting.DistancePointToSegment(point, ends[0], ends[1])
+        distance_to_wall = self._wall_distances.distance(point)
         return inverse_lerp_clamped(0.35, 1.5, distance_to_wall)
 
     def recalculate(self):
@@ -402,10 +399,7 @@ def possible_pylon_connections(position, pylon_node = None):
         if free_slots <= 0: break
         if other in indirectly_connected: continue
         # obstructed?
-        segment = CollidingSegment(position, other.Position)
-        obstructions = list(o for o in Obstruction.CheckForObstructionsNow(world, pylon_node, segment) if o.Owner != other)
-        filtered_obstructions = [o for o in obstructions if obstructs_pylon_connections(o.Owner, segment)]
-        if len(filtered_obstructions) > 0: continue
+        if pylon_connection_obstructed(position, other, pylon_node): continue
         # nope, everything works
         pylons_to_connect_to.append(other)
         indirectly_connected.add(other)
@@ -530,7 +524,7 @@ class HoleMapgen(GlobalCondition):
         self.react_to(Trigger.MapSetup, self.on_map_setup)
         self.react_to(Trigger.MapGenerated, self.on_map_generated)
     def on_map_setup(self, data):
-        gen = data["generation"]
+        gen = generation_from(data)
         dimensions = Vector2(constants.Float("hole.width"), constants.Float("hole.height"))
         gen.Refinement("after_planet_types", 1000, refinement_generate_hole(dimensions, 1.0))
         gen.Refinement("after_planet_types", 1005, refine_remove_signals_in_hole(inverted = False))
@@ -84,7 +84,7 @@ class IzziumMapgen(GlobalCondition):
             game.Conditions.Activate("SectorTypeIzziumScienceBonus()")
 
     def on_map_setup(self, data):
-        map_generation = data["generation"]
+        map_generation = generation_from(data)
         # sprinkle the izzium planets
         planet_types = ["planet.%s" % p for p in ["remnant", "mining", "earthlike", "swamp", "arid", "arctic", "ocean", "jungle"]]
         sprinkler = refinement_sprinkle_quirk(QuirkUnstableIzzium.EXPR, planet_types, 
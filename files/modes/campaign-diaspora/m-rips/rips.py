@@ -6,7 +6,7 @@ class OutpostsMapgen(GlobalCondition):
         self.react_to(Trigger.MapSetup, self.on_map_setup)
 
     def on_map_setup(self, data):
-        map_generation = data["generation"]
+        map_generation = generation_from(data)
         # generate rips        
         map_generation.Refinement("after_planet_types", 1000, refine_place_outposts)
 
@@ -186,7 +186,7 @@ class RipsMissionMapgen(GlobalCondition):
         RipManager.CreateIfNeeded(world)
 
     def on_map_setup(self, data):
-        map_generation = data["generation"]
+        map_generation = generation_from(data)
         # generate rips        
         map_generation.Refinement("after_planet_types", 1050, refinement_add_rip_effects(rip_refinement_settings()))
 
@@ -313,6 +313,7 @@ def refine_place_outposts(gen, signals, zones):
     rng = gen.RNGForTask("outposts")
     races = Randomness.Shuffle(rng, races)
     races += races
+    zone_labels = RipZoneLabels.for_generation(gen, signals)
     
     def pick_signal(rip_name, t, distance, desired_zone):
         rip = rips.RipByName(rip_name)
@@ -322,9 +323,7 @@ def refine_place_outposts(gen, signals, zones):
         sigs = list(gen.SignalsNear(position, 1))
         sigs.sort(key = lambda s: (s.Position - position).sqrMagnitude)
         for s in sigs:
-            scaled_pos = s.Position * distance_scale
-            zone = rips.Zones.ZoneForPoint(scaled_pos)
-            if zone.Name == desired_zone:
+            if zone_labels.zone_of(s).Name == desired_zone:
                 return s
         return None
 
@@ -333,7 +332,7 @@ def refine_place_outposts(gen, signals, zones):
         years_until_death += difficulty_time
         s = pick_signal(rip_name, t, distance, desired_zone)
         if s is None: 
-            gen.RejectThisMap()
+            reject_map(gen, signals, "no signal for the %s outpost" % rip_name)
             return
         race1, race2 = races[0], races[1]
         races = races[2:]
@@ -155,7 +155,7 @@ class AddIzziumMapgen(GlobalCondition):
         self.react_to(Trigger.MapSetup, self.on_map_setup)
 
     def on_map_setup(self, data):
-        map_generation = data["generation"]
+        map_generation = generation_from(data)
         # sprinkle the izzium planets
         izzium_prevalence = constants.Float("sil.izzium_planets")
         planet_types = ["planet.%s" % p for p in ["earthlike", "swamp", "arid", "arctic", "ocean", "jungle", "barren", "ice", "lava"]]
@@ -68,7 +68,8 @@ class VMMSuccessfulInRift:
     def description(self): return LS("mission.vattori.goal.planets_in_rift", None, self._required)
     @staticmethod
     def count_planets():
-        return sum(1 for p in game.Nodes.PlanetsWithLevelOrHigher(2) if regions.PresentFor(p))
+        cache = RegionCache.current()
+        return sum(1 for p in game.Nodes.PlanetsWithLevelOrHigher(2) if cache.present_for(p))
 
 class ScoringRiftPlanets(ScoringFiveRanks):
     def __init__(self, increments):
@@ -166,8 +167,8 @@ class VattoriMissionMapgen(GlobalCondition):
 def nudge_signals_in_or_out(feeler_distance, step):
     # set up parameters
     feeler_distance = f(feeler_distance)
-    feelers = [rotate_vector(Vector2.right * feeler_distance, a) for a in range(0, 360, 45)]
     nudge_size = f(step)
+    samples = RegionCache.current().lattice(feeler_distance * 0.5)
     # actual nudging
     deleted_things = []
     for t in game.Map.Signals:
@@ -175,11 +176,15 @@ def nudge_signals_in_or_out(feeler_distance, step):
         while retries > 0:
             pos = t.Position
             middle = regions.PresentAt(pos)
+            # the coarse lattice (spaced a whole feeler apart) tells us quickly that there is no edge
+            # nearby - only signals close to one look at the finer lattice in between
+            if samples.all_present_as(middle, pos, feeler_distance * 1.5, 2):
+                break
             nudge_dir = Vector2.zero
             needs_nudge = False
-            for fl in feelers:
-                if regions.PresentAt(pos + fl) != middle:
-                    nudge_dir -= fl
+            for v in samples.vertices_near(pos, feeler_distance, 1):
+                if samples.present(v) != middle:
+                    nudge_dir -= samples.position(v) - pos
                     needs_nudge = True
             if needs_nudge:
                 if nudge_dir == Vector2.zero:
@@ -223,6 +228,76 @@ def add_more_stuff_inside_rifts():
             if t.Size == PotentialSize.Small:
                 t.Size = PotentialSize.Medium
 
+###############################################################
+# Region caching
+
+_region_cache = None
+
+class RegionCache:
+    """The regions never change once generated, so whatever we learn about them can be kept: lattice
+    samples for map generation, and the membership of nodes and sides of existing connections for validation."""
+    def __init__(self, regions):
+        self.regions = regions
+        self._lattice = None
+        self._node_membership = {}
+        self._connection_sides = {}
+
+    @staticmethod
+    def current():
+        global _region_cache
+        if _region_cache is None or _region_cache.regions is not regions:
+            _region_cache = RegionCache(regions)
+        return _region_cache
+
+    def present_for(self, node):
+        key = (node, node.Position.x, node.Position.y)
+        present = self._node_membership.get(key)
+        if present is None:
+            present = self._node_membership[key] = self.regions.PresentFor(node)
+        return present
+
+    def connection_in_out(self, conn):
+        a, b = conn.From.Position, conn.To.Position
+        key = (conn, a.x, a.y, b.x, b.y)
+        sides = self._connection_sides.get(key)
+        if sides is None:
+            sides = self._connection_sides[key] = is_connection_in_out(conn)
+        return sides
+
+    def lattice(self, spacing):
+        if not (self._lattice and self._lattice.spacing == spacing):
+            self._lattice = RegionLattice(self.regions, spacing)
+        return self._lattice
+
+class RegionLattice:
+    """Region membership at the vertices of a square lattice, sampled lazily (only around the
+    places that actually get asked about) and remembered. Vertices are (i, j) index pairs."""
+    def __init__(self, regions, spacing):
+        self.regions, self.spacing = regions, spacing
+        self._present = {}
+
+    def position(self, v):
+        return Vector2(v[0] * self.spacing, v[1] * self.spacing)
+
+    def present(self, v):
+        present = self._present.get(v)
+        if present is None:
+            present = self._present[v] = self.regions.PresentAt(self.position(v))
+        return present
+
+    def vertices_near(self, pos, distance, stride):
+        """Vertices with both indices divisible by stride, within distance of pos."""
+        step = self.spacing * stride
+        distance_sq = distance * distance
+        for i in xrange(int(math.ceil((pos.x - distance) / step)), int(math.floor((pos.x + distance) / step)) + 1):
+            for j in xrange(int(math.ceil((pos.y - distance) / step)), int(math.floor((pos.y + distance) / step)) + 1):
+                v = (i * stride, j * stride)
+                if (self.position(v) - pos).sqrMagnitude <= distance_sq:
+                    yield v
+
+    def all_present_as(self, present, pos, distance, stride):
+        return all(self.present(v) == present for v in self.vertices_near(pos, distance, stride))
+
 ###############################################################
 # Building restrictions
 
@@ -233,8 +308,9 @@ CONNECTION_GRACE = 0.0005
 class ForbidCrossingEdges(GlobalCondition):
     def global_connection_validation(self, pc):
         if pc.EndNode:
-            start_in = regions.PresentFor(pc.StartNode)
-            end_in = regions.PresentFor(pc.EndNode)
+            cache = RegionCache.current()
+            start_in = cache.present_for(pc.StartNode)
+            end_in = cache.present_for(pc.EndNode)
             if start_in != end_in:
                 is_shifter = pc.StartNode.NodeType == "structure.phase_shifter" or pc.EndNode.NodeType == "structure.phase_shifter"
                 if not is_shifter:
@@ -256,7 +332,7 @@ class ShifterCrossingRules(GlobalCondition):
         if len(shifter.Connections) != 1:
             return Permission.Yes()
         prev_c = shifter.Connections[0]
-        old_has_ins, old_has_outs = is_connection_in_out(prev_c)
+        old_has_ins, old_has_outs = RegionCache.current().connection_in_out(prev_c)
         new_has_ins, new_has_outs = is_connection_in_out(pc)
         if (old_has_ins and new_has_ins) or (old_has_outs and new_has_outs) or (not new_has_ins and not new_has_outs):
             return Permission.No(LS("connection.problem.both_same_side"))
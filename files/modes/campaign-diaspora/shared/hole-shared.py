@@ -31,8 +31,7 @@ def refine_remove_signals_in_hole(inverted):
             removed = not poly.FullyContainsCircle(circ) if inverted else poly.CollidesWith(circ)
             if removed:
                 affected.append(sig)
-        for sig in affected:
-            gen.RemoveSignal(sig)
+        remove_generated_signals(gen, affected)
     return remover
 
 #########################################
@@ -49,9 +48,92 @@ class EatSignalsOnDiscovery(GlobalCondition):
         if hole.ContainsPoint(pot.Position):
             pot.Discard()
 
+class TrackHoleSlipways(GlobalCondition):
+    """Keeps the connections that can get eaten by the hole in a grid, bucketed by the cells of
+    both ends, so the loss check can pick the ones near the hole without walking every node and
+    connection within its reach. Built lazily, extended as slipways get built, trimmed when the hole
+    eats something, and thrown away on undo/load."""
+    CELL_SIZE = 2.0
+
+    @staticmethod
+    def get():
+        cond = conditions.Get("TrackHoleSlipways()")
+        return cond.PythonObject if cond else None
+
+    @staticmethod
+    def forget_eaten_if_present(nodes):
+        tracker = TrackHoleSlipways.get()
+        if tracker: tracker.forget_nodes(nodes)
+
+    @staticmethod
+    def can_be_eaten(conn):
+        type = conn.Kind.TypedID
+        return type != "connection.invisible" and type != "connection.slowship"
+
+    def activate(self):
+        self._cells = None
+        self.react_to(Trigger.ConnectionBuilt, self.when_connection_built)
+        self.react_to(Trigger.ActionReverted, self.invalidate)
+        self.react_to(Trigger.GameLoaded, self.invalidate)
+
+    def invalidate(self, _ = None):
+        self._cells = None
+
+    def when_connection_built(self, data):
+        if self._cells is not None:
+            self._add(data["connection"])
+
+    def _cell_of(self, position):
+        return (int(math.floor(position.x / self.CELL_SIZE)), int(math.floor(position.y / self.CELL_SIZE)))
+
+    def _add(self, conn):
+        if not self.can_be_eaten(conn): return
+        for cell in set([self._cell_of(conn.From.Position), self._cell_of(conn.To.Position)]):
+            self._cells.setdefault(cell, []).append(conn)
+
+    def forget_nodes(self, nodes):
+        """Drops the connections of eaten nodes - all of them are in the node's own cell,
+        and in the cell of their other end."""
+        if self._cells is None: return
+        for node in nodes:
+            here = self._cells.get(self._cell_of(node.Position), ())
+            gone = [c for c in here if c.From == node or c.To == node]
+            for conn in gone:
+                for cell in set([self._cell_of(conn.From.Position), self._cell_of(conn.To.Position)]):
+                    entries = self._cells.get(cell)
+                    if entries and conn in entries: entries.remove(conn)
+
+    def _rebuild(self):
+        self._cells = {}
+        seen = set()
+        for node in every(Node):
+            for conn in node.Connections:
+                if conn in seen: continue
+                seen.add(conn)
+                self._add(conn)
+
+    def connections_near(self, hole):
+        """Connections with at least one end within the hole's reach (same as the nodes the
+        unindexed check walks through)."""
+        if self._cells is None:
+            self._rebuild()
+        center, reach = hole.Position, hole.Reach
+        reach_sq = reach * reach
+        min_cx, min_cy = self._cell_of(center - Vector2(reach, reach))
+        max_cx, max_cy = self._cell_of(center + Vector2(reach, reach))
+        found = set()
+        for cx in xrange(min_cx, max_cx + 1):
+            for cy in xrange(min_cy, max_cy + 1):
+                for conn in self._cells.get((cx, cy), ()):
+                    if conn in found: continue
+                    if (conn.From.Position - center).sqrMagnitude > reach_sq and (conn.To.Position - center).sqrMagnitude > reach_sq: continue
+                    if conn not in conn.From.Connections: continue # removed since
+                    found.add(conn)
+                    yield conn
+
 class DestroyConsumedObjects:
     def __init__(self, area):
-        self._area = area
+        self._area = list(area)
         self._hole = game.Nodes.FirstWithType("special.hole")
         self._inverted = self._hole.IsInverted
 
@@ -74,20 +156,24 @@ class DestroyConsumedObjects:
     def calculate_endangered_objects(self):
         endangered_stuff = []
         poly = CollidingPolygon(self._area)
-        rule = self.circle_collision_rule(poly, self._hole.IsInverted)
+        outline = HoleOutline(self._hole.Position, self._area, poly)
+        rule = self.circle_collision_rule(poly, outline, self._hole.IsInverted)
         things = list(game.Nodes.PotentialsWithin(self._hole.Position, self._hole.Reach))
         things += (n for n in game.Nodes.Within(self._hole.Position, self._hole.Reach) if self.node_gets_eaten(n))
         for thing in things:
-            circle = CollidingCircle(thing.Position, self.consume_radius(thing))
-            if rule(circle):
+            if rule(thing.Position, self.consume_radius(thing)):
                 endangered_stuff.append(thing)
         return endangered_stuff
 
-    def circle_collision_rule(self, poly, inverted):
-        if inverted:
-            return lambda c: not poly.FullyContainsCircle(c)
-        else:
-            return lambda c: poly.CollidesWith(c)
+    def circle_collision_rule(self, poly, outline, inverted):
+        # the outline settles most circles, only the ones straddling the edge get the exact test
+        def rule(position, radius):
+            side = outline.classify_circle(position, radius)
+            if side == HoleOutline.INSIDE: return not inverted
+            if side == HoleOutline.OUTSIDE: return inverted
+            circle = CollidingCircle(position, radius)
+            return not poly.FullyContainsCircle(circle) if inverted else poly.CollidesWith(circle)
+        return rule
 
     def apply(self):
         endangered = list(self.calculate_endangered_objects())
@@ -112,6 +198,7 @@ class DestroyConsumedObjects:
                     self._dead.remove(thing)
                 else:
                     thing.Discard()
+            TrackHoleSlipways.forget_eaten_if_present(t for t in self._dead if not isinstance(t, Potential))
 
     def revert(self):
         for n in self._dead:
@@ -142,28 +229,37 @@ class LoseBecauseSomethingGotEaten:
             if cls.object_is_important(n): return n
         # slipways
         hole = game.Nodes.FirstWithType("special.hole")
-        possible_slipway_nodes = game.Nodes.Within(hole, hole.Reach)
-        checked = set()
+        tracker = TrackHoleSlipways.get()
+        candidates = tracker.connections_near(hole) if tracker else cls.connections_near(hole)
         conn_rule = cls.make_connection_rule(hole)
-        for n in possible_slipway_nodes:
+        for conn in candidates:
+            if conn_rule(conn):
+                return conn
+        return None
+
+    @staticmethod
+    def connections_near(hole):
+        checked = set()
+        for n in game.Nodes.Within(hole, hole.Reach):
             for conn in n.Connections:
                 if conn in checked: continue
                 checked.add(conn)
-                type = conn.Kind.TypedID
-                if type != "connection.invisible" and type != "connection.slowship":
-                    conn_shape = CollidingSegment(conn.From.Position, conn.To.Position)
-                    # check collision
-                    if conn_rule(conn_shape):
-                        return conn
-        return None
+                if TrackHoleSlipways.can_be_eaten(conn):
+                    yield conn
 
     @staticmethod
     def make_connection_rule(hole):
         poly = hole.Polygon
-        if hole.IsInverted:
-            return lambda s: not poly.FullyContainsSegment(s)
-        else:
-            return lambda s: poly.CollidesWith(s)
+        inverted = hole.IsInverted
+        outline = HoleOutline(hole.Position, [hole.Position + pt for pt in hole.Points], poly)
+        def rule(conn):
+            a, b = conn.From.Position, conn.To.Position
+            side = outline.classify_segment(a, b)
+            if side == HoleOutline.INSIDE: return not inverted
+            if side == HoleOutline.OUTSIDE: return inverted
+            segment = CollidingSegment(a, b)
+            return not poly.FullyContainsSegment(segment) if inverted else poly.CollidesWith(segment)
+        return rule
 
     def apply(self):
         empire.WinningLosing.EndScenario({
@@ -178,6 +274,230 @@ class LoseBecauseSomethingGotEaten:
     def revert(self):
         pass
 
+#########################################
+# Hole outline acceleration
+
+class HoleOutline:
+    """Angular sectors around the hole center, each with a conservative inner and outer radius
+    for the outline edges passing through it. A circle that stays within the inner radius of
+    all the sectors it spans is fully inside the hole polygon, one beyond all the outer radii
+    is fully outside - anything else is UNKNOWN and needs an exact polygon test."""
+    SECTORS = 64
+    INSIDE, OUTSIDE, UNKNOWN = 1, -1, 0
+
+    def __init__(self, center, points, poly):
+        self._cx, self._cy = center.x, center.y
+        count = self.SECTORS
+        self._sector_angle = 2 * math.pi / count
+        self._inner = [float("inf")] * count
+        self._outer = [0.0] * count
+        # "inside" only means anything if the center itself is inside the polygon
+        self._center_inside = poly.FullyContainsCircle(CollidingCircle(center, 0.001))
+        for a, b in zip(points, points[1:] + points[:1]):
+            ax, ay, bx, by = a.x - self._cx, a.y - self._cy, b.x - self._cx, b.y - self._cy
+            closest = math.sqrt(Intersecting.DistancePointToSegmentSquared(center, a, b))
+            farthest = math.sqrt(max(ax * ax + ay * ay, bx * bx + by * by))
+            for sector in self._sectors_between(math.atan2(ay, ax), math.atan2(by, bx), closest):
+                self._inner[sector] = min(self._inner[sector], closest)
+                self._outer[sector] = max(self._outer[sector], farthest)
+
+    def _sectors_between(self, angle_a, angle_b, closest):
+        count = self.SECTORS
+        if closest <= 1e-6: return xrange(count) # the edge goes through the center
+        span = (angle_b - angle_a + math.pi) % (2 * math.pi) - math.pi
+        start = min(angle_a, angle_a + span)
+        first = int(math.floor(start / self._sector_angle))
+        last = int(math.floor((start + abs(span)) / self._sector_angle))
+        return [s % count for s in xrange(first, last + 1)]
+
+    def classify_segment(self, a, b):
+        ax, ay, bx, by = a.x - self._cx, a.y - self._cy, b.x - self._cx, b.y - self._cy
+        closest = math.sqrt(Intersecting.DistancePointToSegmentSquared(Vector2(self._cx, self._cy), a, b))
+        farthest = math.sqrt(max(ax * ax + ay * ay, bx * bx + by * by))
+        sectors = self._sectors_between(math.atan2(ay, ax), math.atan2(by, bx), closest)
+        return self._classify(sectors, closest, farthest)
+
+    def classify_circle(self, position, radius):
+        dx, dy = position.x - self._cx, position.y - self._cy
+        distance = math.sqrt(dx * dx + dy * dy)
+        if distance <= radius:
+            sectors = xrange(self.SECTORS)
+        else:
+            angle, half_span = math.atan2(dy, dx), math.asin(radius / distance)
+            sectors = self._sectors_between(angle - half_span, angle + half_span, distance)
+        return self._classify(sectors, distance - radius, distance + radius)
+
+    def _classify(self, sectors, closest, farthest):
+        if closest > max(self._outer[s] for s in sectors):
+            return self.OUTSIDE
+        if self._center_inside and farthest < min(self._inner[s] for s in sectors):
+            return self.INSIDE
+        return self.UNKNOWN
+
+#########################################
+# Wall distance field
+
+class WallDistanceField:
+    """Distance to the nearest rift wall, rasterized on a grid around the walls and sampled
+    bilinearly. Distances are capped at max_distance (anything past that is 'no wall nearby'),
+    which also bounds the area each wall has to be stamped into. refresh() rebuilds the grid
+    whenever the set of walls changed, and is cheap otherwise."""
+    def __init__(self, max_distance, cell_size):
+        self._max = float(max_distance)
+        self._cell = float(cell_size)
+        self._signature = None
+        self._values = None
+
+    def refresh(self):
+        segments = [wall_end_positions(w) for w in game.Nodes.WithType("structure.rift_wall")]
+        signature = [(a.x, a.y, b.x, b.y) for a, b in segments]
+        if signature == self._signature: return
+        self._signature = signature
+        self._rebuild(signature)
+
+    def _rebuild(self, segments):
+        if not segments:
+            self._values = None
+            return
+        cell, reach = self._cell, self._max + self._cell
+        min_x = min(min(ax, bx) for ax, ay, bx, by in segments) - reach
+        min_y = min(min(ay, by) for ax, ay, bx, by in segments) - reach
+        max_x = max(max(ax, bx) for ax, ay, bx, by in segments) + reach
+        max_y = max(max(ay, by) for ax, ay, bx, by in segments) + reach
+        width = int(math.ceil((max_x - min_x) / cell)) + 1
+        height = int(math.ceil((max_y - min_y) / cell)) + 1
+        values = [self._max] * (width * height)
+        # stamp every wall into the vertices within reach of it
+        for ax, ay, bx, by in segments:
+            dx, dy = bx - ax, by - ay
+            length_sq = dx * dx + dy * dy
+            i_from = max(0, int((min(ax, bx) - reach - min_x) / cell))
+            i_to = min(width - 1, int((max(ax, bx) + reach - min_x) / cell) + 1)
+            j_from = max(0, int((min(ay, by) - reach - min_y) / cell))
+            j_to = min(height - 1, int((max(ay, by) + reach - min_y) / cell) + 1)
+            for j in xrange(j_from, j_to + 1):
+                py = min_y + j * cell
+                row = j * width
+                for i in xrange(i_from, i_to + 1):
+                    px = min_x + i * cell
+                    t = ((px - ax) * dx + (py - ay) * dy) / length_sq if length_sq > 0 else 0.0
+                    t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+                    ex, ey = ax + dx * t - px, ay + dy * t - py
+                    distance = math.sqrt(ex * ex + ey * ey)
+                    if distance < values[row + i]:
+                        values[row + i] = distance
+        self._values, self._origin, self._size = values, (min_x, min_y), (width, height)
+
+    def distance(self, point):
+        if self._signature is None:
+            self.refresh()
+        values = self._values
+        if values is None: return self._max
+        (min_x, min_y), (width, height) = self._origin, self._size
+        gx, gy = (point.x - min_x) / self._cell, (point.y - min_y) / self._cell
+        i, j = int(math.floor(gx)), int(math.floor(gy))
+        if i < 0 or j < 0 or i >= width - 1 or j >= height - 1: return self._max
+        fx, fy = gx - i, gy - j
+        row = j * width + i
+        top = values[row] + (values[row + 1] - values[row]) * fx
+        bottom = values[row + width] + (values[row + width + 1] - values[row + width]) * fx
+        return min(self._max, top + (bottom - top) * fy)
+
+#########################################
+# Pylon planning
+
+def pylon_connection_obstructed(position, other, pylon_node = None):
+    obstacles = PylonObstacles.get()
+    if obstacles: return obstacles.connection_obstructed(position, other, pylon_node)
+    return pylon_connection_obstructed_now(position, other, pylon_node)
+
+def pylon_connection_obstructed_now(position, other, pylon_node):
+    segment = CollidingSegment(position, other.Position)
+    obstructions = (o for o in Obstruction.CheckForObstructionsNow(world, pylon_node, segment) if o.Owner != other)
+    return any(obstructs_pylon_connections(o.Owner, segment) for o in obstructions)
+
+class PylonObstacles(GlobalCondition):
+    """Planets and rift walls in a coarse grid, used to turn down pylon connections that are
+    certainly obstructed (crossing an existing wall or passing right by a planet) without asking
+    the engine - only the rest go through the full obstruction check. Verdicts are remembered too,
+    and everything is dropped whenever the world changes, so dragging a pylon around reuses it all."""
+    CELL_SIZE = 1.0
+    PLANET_RADIUS = 0.6 # planets further away from the segment never obstruct pylon connections
+    MAX_VERDICTS = 256
+
+    @staticmethod
+    def get():
+        cond = conditions.Get("PylonObstacles()")
+        return cond.PythonObject if cond else None
+
+    def activate(self):
+        self.invalidate()
+        self.react_to(Trigger.WorldStateChanged, self.invalidate)
+        self.react_to(Trigger.ActionReverted, self.invalidate)
+        self.react_to(Trigger.GameLoaded, self.invalidate)
+
+    def invalidate(self, _ = None):
+        self._cells = None
+        self._verdicts = {}
+
+    def connection_obstructed(self, position, other, pylon_node):
+        key = (position.x, position.y, other, pylon_node)
+        verdict = self._verdicts.get(key)
+        if verdict is None:
+            if len(self._verdicts) >= self.MAX_VERDICTS:
+                self._verdicts = {}
+            verdict = self.certainly_obstructed(position, other.Position) or pylon_connection_obstructed_now(position, other, pylon_node)
+            self._verdicts[key] = verdict
+        return verdict
+
+    def _rebuild(self):
+        self._cells = {}
+        self._planet_radius = min(self.PLANET_RADIUS, Planet.ObstructionRadius)
+        for node in every(Node):
+            if node.NodeType.startswith("planet."):
+                p = node.Position
+                self._add((node, p.x, p.y, None, None), p.x, p.y, p.x, p.y)
+            elif node.NodeType == "structure.rift_wall":
+                a, b = wall_end_positions(node)
+                self._add((node, a.x, a.y, b.x, b.y), min(a.x, b.x), min(a.y, b.y), max(a.x, b.x), max(a.y, b.y))
+
+    def _cell_range(self, min_x, min_y, max_x, max_y):
+        size = self.CELL_SIZE
+        for cx in xrange(int(math.floor(min_x / size)), int(math.floor(max_x / size)) + 1):
+            for cy in xrange(int(math.floor(min_y / size)), int(math.floor(max_y / size)) + 1):
+                yield (cx, cy)
+
+    def _add(self, entry, min_x, min_y, max_x, max_y):
+        for cell in self._cell_range(min_x, min_y, max_x, max_y):
+            self._cells.setdefault(cell, []).append(entry)
+
+    def certainly_obstructed(self, a, b):
+        if self._cells is None:
+            self._rebuild()
+        r = self._planet_radius
+        checked = set()
+        for cell in self._cell_range(min(a.x, b.x) - r, min(a.y, b.y) - r, max(a.x, b.x) + r, max(a.y, b.y) + r):
+            for entry in self._cells.get(cell, ()):
+                if entry[0] in checked: continue
+                checked.add(entry[0])
+                node, px, py, qx, qy = entry
+                if qx is None:
+                    if Intersecting.DistancePointToSegmentSquared(Vector2(px, py), a, b) < r * r:
+                        return True
+                elif segments_cross_strictly(a.x, a.y, b.x, b.y, px, py, qx, qy):
+                    return True
+        return False
+
+def segments_cross_strictly(ax, ay, bx, by, cx, cy, dx, dy):
+    """True if the segments cross at a point that isn't an end of either (so walls sharing a pylon don't count)."""
+    def side(px, py, qx, qy, rx, ry):
+        return (qx - px) * (ry - py) - (qy - py) * (rx - px)
+    eps = 1e-6
+    c_side, d_side = side(ax, ay, bx, by, cx, cy), side(ax, ay, bx, by, dx, dy)
+    a_side, b_side = side(cx, cy, dx, dy, ax, ay), side(cx, cy, dx, dy, bx, by)
+    return ((c_side > eps and d_side < -eps) or (c_side < -eps and d_side > eps)) and \
+        ((a_side > eps and b_side < -eps) or (a_side < -eps and b_side > eps))
+
 #########################################
 # Consequences
 
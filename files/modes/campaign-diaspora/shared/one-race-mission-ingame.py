@@ -83,7 +83,7 @@ class OneRaceRipsMapgen(GlobalCondition):
         RipManager.CreateIfNeeded(world)
 
     def on_map_setup(self, data):
-        map_generation = data["generation"]
+        map_generation = generation_from(data)
         # add rips during mapgen
         count = self._count
         map_generation.Refinement("after_planet_types", 1000, refinement_place_rips(count, 1, 3.6, settings = {
@@ -1,46 +1,40 @@
 ##############################################
 # Map generation
 
+import bisect
+
 def refinement_add_rip_effects(settings):
     applied_quirk = settings.get("apply_quirk", None)
 
     def refine(gen, signals, zones):
         distance_scale = constants.Float("distance.scale")
+        index = signal_index(gen, signals)
 
         def remove_planets_in_joint(joint):
             center = joint.Center / distance_scale
             radius = joint.Radius / distance_scale
             remove_distance = radius + 0.15
-            sigs_to_remove = list(gen.SignalsNear(center, remove_distance))
-            for sig in sigs_to_remove:
-                gen.RemoveSignal(sig)
+            remove_generated_signals(gen, index.near(center, remove_distance))
 
         def affect_planets_close_to_rip(rip_points):
-            sigs_to_remove = []
-            affected = {}
-            for p in rip_points:
-                pt = p.position / distance_scale
-                remove_distance = p.width / distance_scale + 0.13
-                scan_distance = remove_distance + 1.2
-                for sig in gen.SignalsNear(pt, scan_distance):
-                    dist = (pt - sig.Position).magnitude
-                    if dist <= remove_distance:
-                        sigs_to_remove.append(sig)
-                        affected.pop(sig, None)
-                    else:
-                        affected[sig] = min(affected.get(sig, 1000), dist)            
+            removal_margin, affect_margin = 0.13, 0.13 + 1.2
+            centers = [p.position / distance_scale for p in rip_points]
+            widths = [p.width / distance_scale for p in rip_points]
+            margins = index.margins_to_circles(centers, widths, affect_margin)
+            sigs_to_remove = [sig for sig, margin in margins.items() if margin <= removal_margin]
+            affected = [sig for sig, margin in margins.items() if margin > removal_margin]
             # remove signals that fall into the rip
-            for s in sigs_to_remove:
-                gen.RemoveSignal(s)
+            remove_generated_signals(gen, sigs_to_remove)
             # add quirks to planets close to the rip, if settings say so
             if applied_quirk is not None:
                 quirks_added = 0
                 min_distance_between_quirked = 2.2
-                for sig, dist in affected.items():
-                    sig_zone = rips.Zones.ZoneForPoint(sig.Position * distance_scale)
+                zone_labels = RipZoneLabels.for_generation(gen, signals)
+                for sig in affected:
                     if sig.Contents.startswith("planet."):
-                        neighbors = gen.Neighbors(sig, min_distance_between_quirked)
-                        quirk_present_nearby = any(n.Quirk == applied_quirk and rips.Zones.ZoneForPoint(n.Position * distance_scale) == sig_zone for n in neighbors)
+                        sig_zone = zone_labels.zone_of(sig)
+                        neighbors = index.neighbors(sig, min_distance_between_quirked)
+                        quirk_present_nearby = any(n.Quirk == applied_quirk and zone_labels.zone_of(n) == sig_zone for n in neighbors)
                         if not quirk_present_nearby:
                             sig.Quirk = applied_quirk
                             quirks_added += 1
@@ -53,6 +47,31 @@ def refinement_add_rip_effects(settings):
     return refine
 
 
+class RipZoneLabels:
+    """Rip zones of the signals in the current generation pass. ZoneForPoint has to test the
+    point against the rips, so every signal gets labelled at most once. Labels are dropped for
+    a new generation pass, and whenever rips or joints were added in the meantime."""
+    _current = [None]
+
+    @staticmethod
+    def for_generation(gen, signals):
+        index = signal_index(gen, signals)
+        version = (len(list(rips.RipDefinitions)), len(list(rips.JointDefinitions)))
+        labels = RipZoneLabels._current[0]
+        if labels is None or labels._index is not index or labels._version != version:
+            labels = RipZoneLabels._current[0] = RipZoneLabels(index, version)
+        return labels
+
+    def __init__(self, index, version):
+        self._index, self._version = index, version
+        self._distance_scale = constants.Float("distance.scale")
+        self._zones = {}
+
+    def zone_of(self, signal):
+        if signal not in self._zones:
+            self._zones[signal] = rips.Zones.ZoneForPoint(signal.Position * self._distance_scale)
+        return self._zones[signal]
+
 def refinement_place_rips(count, min_length, max_length, forced_close = [], settings = None):
     distance_scale = constants.Float("distance.scale")
     settings = settings or {}
@@ -183,97 +202,201 @@ def refinement_place_rips(count, min_length, max_length, forced_close = [], sett
                 log("Had to finish at %d rips, can't place another one." % rip_index)
         # store the rip information for instantiation and restoring
         game.CustomData.Set("rip_placement", [pr.points() for pr in placed_rips])
+        game.CustomData.Set("rip_geometry_version", RIP_GEOMETRY_VERSION)
+        game.CustomData.Set("rip_tessellation_key", None) # new placement, tessellate again
     return refine
 
 def refinement_instantiate_rips(gen, signals, zones):
     generate_rips(rips)
 
+# 1: rips sampled evenly by spline t
+# 2: rips sampled evenly by length
+RIP_GEOMETRY_VERSION = 2
+# bump whenever the tessellation changes, so stored tessellations get rebuilt on load
+RIP_TESSELLATION_FORMAT = 1
+RIP_TESSELLATION_PER_POINT = 8
+RIP_ALPHA, RIP_TENSION = 0.5, 0.0 # spline parameters
+
 def generate_rips_from_stored_points(rip_manager):
-    def generate_points(rip_data):
-        count = len(rip_data)
-        t_step = 1.0 / (count - 1)
-        point_t = 0.0
-        for point_pos in rip_data:
-            yield (point_pos, point_t)
-            point_t += t_step
     # recreate rips from stored data, if present
     # if not, skip it (we'll generate and instantiate the rips during mapgen in a second)
-    ALPHA, TENSION = 0.5, 0.0 # spline parameters
     rips_data = game.CustomData.GetOr("rip_placement", None)
     if rips_data is None: return
     length_scale = 0.1
-    rng = Randomness.SeededRNG("rip_widths")
+    if game.CustomData.GetOr("rip_geometry_version", 1) < 2:
+        # older saves keep their rips exactly as they were, sampled from the spline
+        widths = rip_widths(rips_data)
+        for index, rip_data in enumerate(rips_data):
+            points = list(points_with_even_t(rip_data))
+            rip = rip_manager.AddRip("rip%d" % index, req_spline(points, length_scale, RIP_ALPHA, RIP_TENSION), f(0.0), f(length_scale), len(points) * 2)
+            rip.SetBaseWidth(widths[index])
+            rip.TaperBothEnds().Commit()
+        return
+    tessellations, widths = stored_rip_tessellations(rips_data)
     for index, rip_data in enumerate(rips_data):
-        points = list(generate_points(rip_data))
-        total_length = sum((points[i+1][0] - points[i][0]).magnitude for i in range(len(points)-1))
-        max_width = 0.17 + 0.35 * inverse_lerp_clamped(6, 20, total_length)
-        actual_width = Randomness.Float(rng, 0.8, 1.2) * max_width    
-        rip = rip_manager.AddRip("rip%d" % index, req_spline(points, length_scale, ALPHA, TENSION), f(0.0), f(length_scale), len(points) * 2)
-        rip.SetBaseWidth(actual_width)
+        points = list(points_with_even_t(tessellations[index]))
+        rip = rip_manager.AddRip("rip%d" % index, req_predefined_points(points, length_scale), f(0.0), f(length_scale), len(rip_data) * 2)
+        rip.SetBaseWidth(widths[index])
         rip.TaperBothEnds().Commit()
     # no zones or joints for this one, that's it
 
+def points_with_even_t(positions):
+    count = len(positions)
+    t_step = 1.0 / (count - 1)
+    point_t = 0.0
+    for point_pos in positions:
+        yield (point_pos, point_t)
+        point_t += t_step
+
+def stored_rip_tessellations(rips_data):
+    """The finished rip polylines and widths, as stored in the save. They only get rebuilt from
+    the placement points (and stored again) when the geometry or tessellation format changed."""
+    geometry_version = game.CustomData.GetOr("rip_geometry_version", 1)
+    key = "%d/%d" % (geometry_version, RIP_TESSELLATION_FORMAT)
+    if game.CustomData.GetOr("rip_tessellation_key", None) == key:
+        return game.CustomData.Get("rip_tessellations"), game.CustomData.Get("rip_widths")
+    tessellations, widths = tessellate_rips(rips_data), rip_widths(rips_data)
+    game.CustomData.Set("rip_tessellations", tessellations)
+    game.CustomData.Set("rip_widths", widths)
+    game.CustomData.Set("rip_tessellation_key", key)
+    return tessellations, widths
+
+def tessellate_rips(rips_data):
+    tessellations = []
+    for rip_data in rips_data:
+        spline = RipSpline(list(points_with_even_t(rip_data)), 1.0, RIP_ALPHA, RIP_TENSION)
+        tessellations.append(spline.tessellate((len(rip_data) - 1) * RIP_TESSELLATION_PER_POINT + 1))
+    return tessellations
+
+def rip_widths(rips_data):
+    rng = Randomness.SeededRNG("rip_widths")
+    widths = []
+    for rip_data in rips_data:
+        total_length = sum((rip_data[i+1] - rip_data[i]).magnitude for i in range(len(rip_data)-1))
+        max_width = 0.17 + 0.35 * inverse_lerp_clamped(6, 20, total_length)
+        widths.append(Randomness.Float(rng, 0.8, 1.2) * max_width)
+    return widths
+
+def rip_segment_before(ts, point_t):
+    """Index of the segment of a rip point list containing point_t (ts being the point t values)."""
+    return max(0, min(len(ts) - 2, bisect.bisect_right(ts, point_t) - 1))
+
 def req_predefined_points(points, length_scale):
-    count = len(points)
+    ts = [p[1] for p in points]
     def point(point_t):
         # rescale point_t to 0-1
         point_t /= length_scale
-        # bisect to find the right segment
-        before, after = 0, count - 1
-        while after - before > 1:
-            mid = ((before + after) / 2)
-            mid_t = points[mid][1]
-            if mid_t <= point_t:
-                before = mid
-            else:
-                after = mid
         # interpolate within the segment
+        before = rip_segment_before(ts, point_t)
         bpos, bt = points[before]
-        apos, at = points[after]
+        apos, at = points[before + 1]
         place_between_points = inverse_lerp(bt, at, point_t)
         return Vector2.LerpUnclamped(bpos, apos, place_between_points)
     return point
 
 def req_spline(points, length_scale, alpha, tension):
-    def make_piece(p0, p1, p2, p3):
-        return CatmullRom(p0, p1, p2, p3, alpha, tension)    
-    count = len(points)
-    # prepare the spline
-    pieces = []
-    ps = [p[0] for p in points]
-    pre_point = ps[0] + (ps[0] - ps[-1]).normalized
-    post_point = ps[-1] + (ps[-1] -ps[0]).normalized
-    pieces.append(make_piece(pre_point, ps[0], ps[1], ps[2]))
-    for i in xrange(1, len(ps) - 2):        
-        pieces.append(make_piece(ps[i-1], ps[i], ps[i+1], ps[i+2]))
-    pieces.append(make_piece(ps[-3], ps[-2], ps[-1], post_point))
-    # the actual calculation
-    def evaluate(point_t):
-        # rescale point_t to 0-1
-        point_t /= length_scale
-        # bisect to find the right segment
-        before, after = 0, count - 1
-        while after - before > 1:
-            mid = ((before + after) / 2)
-            mid_t = points[mid][1]
-            if mid_t <= point_t:
-                before = mid
-            else:
-                after = mid
-        # interpolate within the segment
-        bpos, bt = points[before]
-        apos, at = points[after]
-        piece = pieces[before]
-        piece_t = inverse_lerp(bt, at, point_t)
-        return piece.Evaluate(piece_t)        
-    return evaluate
+    return RipSpline(points, length_scale, alpha, tension).evaluate
+
+class RipSpline:
+    """Catmull-Rom spline through a list of (position, t) rip points. Evaluated positions are
+    memoized, since the rip manager samples the same t values again for widths and collisions.
+    Also keeps an arc-length table, so the spline can be sampled evenly by length instead of
+    evenly by t (which crowds samples wherever the rip points are close together)."""
+    TABLE_SAMPLES_PER_PIECE = 16
+
+    def __init__(self, points, length_scale, alpha, tension):
+        def make_piece(p0, p1, p2, p3):
+            return CatmullRom(p0, p1, p2, p3, alpha, tension)
+        self._length_scale = length_scale
+        self._ts = [p[1] for p in points]
+        # prepare the spline
+        pieces = []
+        ps = [p[0] for p in points]
+        pre_point = ps[0] + (ps[0] - ps[-1]).normalized
+        post_point = ps[-1] + (ps[-1] -ps[0]).normalized
+        pieces.append(make_piece(pre_point, ps[0], ps[1], ps[2]))
+        for i in xrange(1, len(ps) - 2):
+            pieces.append(make_piece(ps[i-1], ps[i], ps[i+1], ps[i+2]))
+        pieces.append(make_piece(ps[-3], ps[-2], ps[-1], post_point))
+        self._pieces = pieces
+        self._evaluated = {}
+        self._arc_lengths = None # cumulative lengths at _arc_ts
+
+    def evaluate(self, point_t):
+        position = self._evaluated.get(point_t, None)
+        if position is None:
+            position = self._evaluated[point_t] = self._evaluate_unscaled(point_t / self._length_scale, None)
+        return position
+
+    def evaluate_many(self, point_ts):
+        """Evaluates a whole list of t values (in the 0-length_scale range). Sorted input is walked
+        through the pieces in a single pass, without bisecting for each value."""
+        evaluated, scale = self._evaluated, self._length_scale
+        result, hint = [], 0
+        for point_t in point_ts:
+            position = evaluated.get(point_t, None)
+            if position is None:
+                unscaled = point_t / scale
+                hint = self._advance(hint, unscaled)
+                position = evaluated[point_t] = self._evaluate_unscaled(unscaled, hint)
+            result.append(position)
+        return result
+
+    def tessellate(self, count):
+        """count points spaced evenly by length, from one end of the spline to the other."""
+        step = 1.0 / (count - 1)
+        return self.evaluate_many([self.t_at_length_fraction(i * step) * self._length_scale for i in xrange(count)])
+
+    def t_at_length_fraction(self, fraction):
+        lengths = self._arc_table()
+        target = clamp(0.0, 1.0, fraction) * lengths[-1]
+        i = max(0, min(len(lengths) - 2, bisect.bisect_right(lengths, target) - 1))
+        span = lengths[i + 1] - lengths[i]
+        local = (target - lengths[i]) / span if span > 0 else 0.0
+        return lerp(self._arc_ts[i], self._arc_ts[i + 1], local)
+
+    # --- internals
+
+    def _advance(self, hint, unscaled_t):
+        """The segment containing unscaled_t, searching forward from the previous one."""
+        ts, last = self._ts, len(self._ts) - 2
+        while hint < last and ts[hint + 1] <= unscaled_t:
+            hint += 1
+        if hint > 0 and ts[hint] > unscaled_t:
+            return rip_segment_before(ts, unscaled_t) # went backwards
+        return hint
+
+    def _evaluate_unscaled(self, unscaled_t, before):
+        ts = self._ts
+        if before is None:
+            before = rip_segment_before(ts, unscaled_t)
+        piece_t = inverse_lerp(ts[before], ts[before + 1], unscaled_t)
+        return self._pieces[before].Evaluate(piece_t)
+
+    def _arc_table(self):
+        if self._arc_lengths is None:
+            samples = self.TABLE_SAMPLES_PER_PIECE
+            ts, arc_ts = self._ts, []
+            for i in xrange(len(ts) - 1):
+                for j in xrange(samples):
+                    arc_ts.append(lerp(ts[i], ts[i + 1], j / float(samples)))
+            arc_ts.append(ts[-1])
+            positions = self.evaluate_many([t * self._length_scale for t in arc_ts])
+            lengths = [0.0]
+            for a, b in zip(positions, positions[1:]):
+                lengths.append(lengths[-1] + (b - a).magnitude)
+            self._arc_ts, self._arc_lengths = arc_ts, lengths
+        return self._arc_lengths
 
 class GeneratedRip:
     SAFETY_RADIUS = 1.5
+    SEGMENT_INDEX_CELL = 2.0
     def __init__(self, points):
         self._ps = points
         self._collision_ps = self._extend_points(points, self.SAFETY_RADIUS)
         self._aabb = self._calculate_aabb(self._collision_ps)
+        self._segments = [GeneratedRipSegment(a, b, self.SAFETY_RADIUS * 0.5) for a, b in zip(self._collision_ps, self._collision_ps[1:])]
+        self._segment_index = None
 
     def _calculate_aabb(self, points):
         fudge = self.SAFETY_RADIUS
@@ -290,29 +413,42 @@ class GeneratedRip:
         extended.append(post_point)
         return extended
 
+    def segment_index(self):
+        if self._segment_index is None:
+            self._segment_index = SpatialAABBIndex.Create(f(self.SEGMENT_INDEX_CELL), GeneratedRipSegment.aabb)
+            for segment in self._segments:
+                self._segment_index.Add(segment)
+        return self._segment_index
+
     def crosses(self, other):
+        # segment boxes are padded by half the safety radius each, so any pair of segments that
+        # could intersect (or bring an endpoint within the safety radius) has overlapping boxes
         SAFETY_RADIUS = f(self.SAFETY_RADIUS)
-        ps, ops = self.collision_points(), other.collision_points()
-        p_count, op_count = len(ps), len(ops)
-        for pi in range(p_count - 1):
-            me_a, me_b = ps[pi], ps[pi+1]
-            for opi in range(op_count - 1):
-                o_a, o_b = ops[opi], ops[opi+1]
+        index = self.segment_index()
+        for o_seg in other.segments():
+            o_a, o_b = o_seg.a, o_seg.b
+            for seg in index.CrossingBoundingBoxesWith(o_seg):
+                me_a, me_b = seg.a, seg.b
                 if Intersecting.SegmentsIntersect(me_a, me_b, o_a, o_b):
-                    return True            
-            for o_p in ops:
-                if Intersecting.SegmentIntersectsCircleStrict(me_a, me_b, o_p, SAFETY_RADIUS):
                     return True
-        for me_p in ps:
-            for opi in range(op_count - 1):
-                o_a, o_b = ops[opi], ops[opi+1]
-                if Intersecting.SegmentIntersectsCircleStrict(o_a, o_b, me_p, SAFETY_RADIUS):
+                if Intersecting.SegmentIntersectsCircleStrict(me_a, me_b, o_a, SAFETY_RADIUS) or Intersecting.SegmentIntersectsCircleStrict(me_a, me_b, o_b, SAFETY_RADIUS):
+                    return True
+                if Intersecting.SegmentIntersectsCircleStrict(o_a, o_b, me_a, SAFETY_RADIUS) or Intersecting.SegmentIntersectsCircleStrict(o_a, o_b, me_b, SAFETY_RADIUS):
                     return True
         return False
 
     def points(self): return self._ps
     def aabb(self): return self._aabb
     def collision_points(self): return self._collision_ps
+    def segments(self): return self._segments
+
+class GeneratedRipSegment:
+    def __init__(self, a, b, padding):
+        self.a, self.b = a, b
+        self._aabb = Rect(Vector2(min(a.x, b.x) - padding, min(a.y, b.y) - padding),
+            Vector2(abs(a.x - b.x) + padding * 2, abs(a.y - b.y) + padding * 2))
+
+    def aabb(self): return self._aabb
 
 ###############################################
 # Rip equation functions
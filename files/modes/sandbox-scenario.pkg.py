@@ -12,7 +12,7 @@ mutators = [
     "mut_quest_difficulty(3, 40)"
 ]
 starting_conditions = [
-    "StandardMapgen()",
+    "StandardMapgen(cache_sectors = True)",
     "StandardPlanetQuirks()",
     "SandboxResources()",
     "SandboxConditions()",
@@ -7,7 +7,7 @@ contents = [
     "tutorial/ingame-tutorials.py"
 ]
 starting_conditions = [
-    key("mapgen") / "StandardMapgen()",
+    key("mapgen") / "StandardMapgen(cache_sectors = True)",
     "StandardPlanetQuirks()",
     "StandardConditions()",
     "StandardQuests()",
@@ -1,6 +1,7 @@
 class StandardMapgen(GlobalCondition):
-    def __init__(self, hooks = None):
+    def __init__(self, hooks = None, cache_sectors = False):
         self._hooks = hooks or MapgenDefaults()
+        self._cache_sectors = cache_sectors
 
     def activate(self):
         self._difficulty_adjustment = constants.Float("map.difficulty")
@@ -8,7 +9,9 @@ class StandardMapgen(GlobalCondition):
 
     def on_map_setup(self, data):
         # --- grab 
-        map_generation = data["generation"]
+        map_generation = generation_from(data)
+        if self._cache_sectors:
+            GeneratedSectorCache.attach(map_generation)
         # --- calculate various constants
         zone_config = self._hooks.create_zones()        
         planet_counts = zone_config["planet_counts"] # total planet counts in each zone
@@ -111,23 +114,27 @@ class StandardMapgen(GlobalCondition):
     @staticmethod
     def prefer_bigger_if_isolated(signal, tag, gen):
         if tag == "small":
-            nearby_nodes = gen.CountNeighbors(signal, 1.8)
+            nearby_nodes = signal_index(gen, probe=signal).count_neighbors(signal, 1.8)
             if nearby_nodes < 4:
                 return 1.0
 
     @staticmethod
     def enforce_variety(leeway):
         def rule(signal, tag, gen):
-            prop = gen.ProportionAmongNeighbors(signal, 2, tag)
+            tally = neighborhood_tally(gen, signal, 2, "sizes")
+            total = tally.total(signal)
+            if total == 0: return -leeway
+            prop = tally.count(signal, tag) / float(total)
             return prop - leeway
         return rule
 
     @staticmethod
     def keep_things_apart(signal, tag, gen):
-        if tag == "structure.forebear_station" and gen.HasNeighbor(signal, 3, "structure.forebear_station"):
+        index = signal_index(gen, probe=signal)
+        if tag == "structure.forebear_station" and index.has_neighbor(signal, 3, "structure.forebear_station", live=True):
             return 1.0
         if tag == "nothing":
-            return gen.CountNeighbors(signal, 1.5, "nothing") * 0.4
+            return index.count_neighbors(signal, 1.5, "nothing", live=True) * 0.4
 
 
     @staticmethod
@@ -140,7 +147,7 @@ class StandardMapgen(GlobalCondition):
 
     @staticmethod
     def enforce_planet_variety(signal, tag, gen):
-        return gen.CountNeighbors(signal, 2, tag) * 0.66
+        return neighborhood_tally(gen, signal, 2, "planet_types").count(signal, tag) * 0.66
 
 class MapgenDefaults:
     def create_zones(self):
@@ -154,20 +161,13 @@ class MapgenDefaults:
             "link_values": link_values_per_planet
         }
 
-####################################
-# Logging
-
-GENERATION_LOGS = False
-def gen_log(*args):
-    if GENERATION_LOGS: log(*args)
-
 ####################################
 # Planet type mix enforcement, generation time
 
 def enforce_planet_type_fairness(planet_values, strength):
     pv = planet_values
     def enforce(signal, tag, gen):
-        neighborhood_sum = sum((pv[n.Contents] if n.Contents in pv else 0) for n in ih(gen.Neighbors(signal, 3)))
+        neighborhood_sum = neighborhood_tally(gen, signal, 3, "planet_types").weighted_sum(signal, pv)
         my_value = pv[tag]
         penalty = my_value * neighborhood_sum * strength
         return penalty
@@ -176,23 +176,16 @@ def enforce_planet_type_fairness(planet_values, strength):
 ####################################
 # Planet count refinement
 
+import heapq
+
 def refinement_planet_counts_in_zones(counts_per_zone):
     """The goal of this refinement is to make sure the planet count within each zone falls within certain parameters."""
     # pre-grab some stuff
     slipway_range = constants.Float("slipway.range") # not .Distance() since we use unadjusted distances in generation
     double_sw_range = slipway_range * 2
-    double_sw_range_sq = double_sw_range * double_sw_range
     # the actual refinement function
-    def refine(gen, _, zones):
-        # helpers
-        def distance_to_nearest_planet(signal):
-            min_distance_sq = double_sw_range_sq
-            pos = signal.Position
-            for n in gen.Neighbors(signal, double_sw_range):
-                distance_sq = (n.Position - pos).sqrMagnitude
-                if distance_sq < min_distance_sq:
-                    min_distance_sq = distance_sq
-            return min_distance_sq
+    def refine(gen, signals, zones):
+        index = signal_index(gen, signals)
         # logic
         for zone in zones:
             desired_count = counts_per_zone[zone.Index]
@@ -201,19 +194,17 @@ def refinement_planet_counts_in_zones(counts_per_zone):
             if delta < 0:
                 # turn some planets into non-planets
                 signals = list(s for s in zone.Signals if s.Size == PotentialSize.Medium and s.Contents.startswith("planet."))
-                signals.sort(key=distance_to_nearest_planet) # start with ones that are most 'crowded'
-                for fixable in signals:
-                    fixable.Contents = "nothing"
+                distances = index.nearest_distances_sq(signals, double_sw_range, "planet.")
+                for fixable in heapq.nsmallest(-delta, signals, key=distances.get): # start with ones that are most 'crowded'
+                    index.set_contents(fixable, "nothing")
                     delta += 1
-                    if delta == 0: break
             elif delta > 0:
                 # turn some non-planets into planets
                 signals = list(s for s in zone.Signals if s.Size == PotentialSize.Medium and not s.Contents.startswith("planet."))
-                signals.sort(key=distance_to_nearest_planet, reverse=True) # start with ones that are most isolated
-                for fixable in signals:
-                    fixable.Contents = "planet.?"
+                distances = index.nearest_distances_sq(signals, double_sw_range, "planet.")
+                for fixable in heapq.nlargest(delta, signals, key=distances.get): # start with ones that are most isolated
+                    index.set_contents(fixable, "planet.?")
                     delta -= 1
-                    if delta == 0: break      
             gen_log("Was: %d, Is: %d" % ((desired_count - starting_count), delta))
     # return the function
     return refine
@@ -228,14 +219,14 @@ def refinement_avoid_isolated_smalls(distance_in_slipway_lengths):
     # logic
     def refine(gen, signals, _):
         SIZE_S = PotentialSize.Small
+        index = signal_index(gen, signals)
         adjustments_done = 0
         for s in signals:
             # is it ok already?
             if s.Size != SIZE_S: continue
-            if any(n.Size != SIZE_S for n in gen.Neighbors(s, check_distance)): continue
+            if any(n.Size != SIZE_S for n in index.neighbors(s, check_distance)): continue
             # no, bump it up
-            s.Size = PotentialSize.Medium
-            s.Contents = "medium"
+            index.set_size(s, PotentialSize.Medium, "medium")
             adjustments_done += 1
         gen_log("Size bumps: %d" % adjustments_done)
     # return closure
@@ -251,13 +242,14 @@ def refinement_avoid_planet_voids(distance_in_slipway_lengths):
     def refine(gen, signals, _):
         adjustments_done = 0
         SIZE_M = PotentialSize.Medium
+        index = signal_index(gen, signals)
         for s in signals:
             # is it ok already?
             if s.Size != SIZE_M: continue
-            planet_neighbors = sum(1 for p in gen.Neighbors(s, check_distance) if p.Contents.startswith("planet."))
+            planet_neighbors = index.count_neighbors(s, check_distance, "planet.")
             if planet_neighbors > 2: continue
             # no, bump it to a planet
-            s.Contents = "planet.?"
+            index.set_contents(s, "planet.?")
             adjustments_done += 1
         gen_log("Empty->planet bumps: %d" % adjustments_done)
     # return closure
@@ -268,12 +260,13 @@ def refinement_avoid_planet_voids_v2(max_distance_in_slipway_lengths):
     def refine(gen, signals, _):
         adjustments_done = 0
         SIZE_M = PotentialSize.Medium
+        index = signal_index(gen, signals)
         for s in signals:
             # is it ok already?
             if s.Size != SIZE_M: continue
-            if any(n for n in gen.Neighbors(s, check_distance) if n.Contents.startswith("planet.")): continue
+            if index.has_neighbor(s, check_distance, "planet."): continue
             # no, bump it to a planet
-            s.Contents = "planet.?"
+            index.set_contents(s, "planet.?")
             adjustments_done += 1
         gen_log("Empty->planet bumps: %d" % adjustments_done)
     return refine
@@ -286,21 +279,21 @@ def refinement_guarantee_stations(max_distance_between):
     slipway_range = constants.Float("slipway.range")
     max_distance = max_distance_between * slipway_range
     def refine(gen, signals, zones):
+        index = signal_index(gen, signals)
         # ensure a station in the starting zone
         has_starting_station = any(s.Contents == station for s in zones[0].Signals)
         if not has_starting_station:
             upgraded = next((s for s in zones[0].Signals if s.Contents == "nothing"), None)
             if upgraded:
-                upgraded.Contents = station
+                index.set_contents(upgraded, station)
                 gen_log("Added a station to the starting zone.")
         # ensure a consistent minimum density
-        stations = [s for s in signals if s.Contents == station]
+        # (stations added during the sweep go into the index right away, so later signals see them)
         added = 0
-        for signal in (s for s in signals if s.Size == PotentialSize.Small and s.Contents == "nothing"):
-            closest_station = min(stations, key=lambda station: (signal.Position - station.Position).sqrMagnitude)
-            distance = (signal.Position - closest_station.Position).magnitude
-            if distance > max_distance:
-                signal.Contents = station
+        candidates = [s for s in signals if s.Size == PotentialSize.Small and s.Contents == "nothing"]
+        for signal in candidates:
+            if not index.has_neighbor(signal, max_distance, station):
+                index.set_contents(signal, station)
                 added += 1
         gen_log("Added stations: %d" % added)
     return refine
@@ -338,6 +331,56 @@ def refinement_place(node_type, distance_range, pot_size):
         gen_log("Placed %s." % node_type)
     return refine
 
+def pick_spread_out(rng, signals, count):
+    """Picks 'count' signals that are as far apart as possible. Candidates are shuffled with the
+    rng, then a Poisson-disk pass keeps each one that has no kept signal closer than a spacing;
+    the spacing is binary searched for the largest one that still keeps 'count' signals. A pass
+    keeps at least 'count' for any spacing below half of the best possible minimum distance, so
+    the result is always within half of optimal. Kept signals are bucketed in a grid with the
+    spacing as cell size, so each pass is linear in the number of candidates."""
+    signals = list(signals)
+    if count <= 0: return []
+    if count >= len(signals): return signals
+    signals = Randomness.Shuffle(rng, signals)
+    if count == 1: return signals[:1]
+    coords = [(s.Position.x, s.Position.y) for s in signals]
+    xs, ys = [x for x, _ in coords], [y for _, y in coords]
+    low, high = 0.0, math.sqrt((max(xs) - min(xs)) ** 2 + (max(ys) - min(ys)) ** 2)
+    if high <= 0: return signals[:count]
+    best = list(range(count))
+    for _ in range(20):
+        spacing = (low + high) * 0.5
+        kept = _poisson_disk_pass(coords, spacing, count)
+        if len(kept) >= count:
+            low, best = spacing, kept
+        else:
+            high = spacing
+    return [signals[i] for i in best[:count]]
+
+def _poisson_disk_pass(coords, spacing, enough):
+    """Indices of the coordinates kept by one greedy pass, stopping once 'enough' are kept."""
+    spacing_sq = spacing * spacing
+    inv_cell = 1.0 / spacing
+    grid = {} # (cx, cy) -> kept indices
+    kept = []
+    for i, (x, y) in enumerate(coords):
+        cx, cy = int(math.floor(x * inv_cell)), int(math.floor(y * inv_cell))
+        too_close = False
+        for gx in range(cx - 1, cx + 2):
+            for gy in range(cy - 1, cy + 2):
+                for k in grid.get((gx, gy), ()):
+                    kx, ky = coords[k]
+                    if (kx - x) * (kx - x) + (ky - y) * (ky - y) < spacing_sq:
+                        too_close = True
+                        break
+                if too_close: break
+            if too_close: break
+        if too_close: continue
+        kept.append(i)
+        if len(kept) >= enough: break
+        grid.setdefault((cx, cy), []).append(i)
+    return kept
+
 def refinement_sprinkle_quirk(quirk, node_types, zone_density, maximize_distances = False):
     """Adds a quirk to planets."""
     def refine(gen, signals, zones):
@@ -359,18 +402,7 @@ def refinement_sprinkle_quirk(quirk, node_types, zone_density, maximize_distance
                 added_count = len(candidates)
             if added_count == 0: continue
             if maximize_distances:
-                best_set, best_dist = None, 0
-                for i in range(10):
-                    targets = list(Randomness.PickMany(rng, candidates, added_count))
-                    closest_dist = 100000.0
-                    for j in range(len(targets)):
-                        for k in range(j+1, len(targets)):
-                            a, b = targets[j], targets[k]
-                            dist = (a.Position - b.Position).sqrMagnitude
-                            if dist < closest_dist: closest_dist = dist
-                    if closest_dist > best_dist:
-                        best_set, best_dist = targets, closest_dist
-                targets = best_set
+                targets = pick_spread_out(rng, candidates, added_count)
             else:
                 targets = Randomness.PickMany(rng, candidates, added_count)
             for t in targets:
@@ -382,6 +414,70 @@ def refinement_sprinkle_quirk(quirk, node_types, zone_density, maximize_distance
 ####################################################
 # Planet type refinement for consistent link values
 
+def find_unobstructed_neighbors(index, neighbor_lists, obstruction_radius):
+    """Batched version of the lenient obstruction test: for each signal in neighbor_lists,
+    keeps the neighbors that can be reached without the straight path passing through any other
+    neighbor's obstruction circle. All pairs are pre-rejected in plain Python using a slightly
+    inflated radius and bounding boxes, and only the few borderline pairs are confirmed with
+    Intersecting.SegmentIntersectsCircleLenient - the results are identical to testing everything
+    with it, as long as a segment missing the inflated circle never counts as intersecting."""
+    check_radius = obstruction_radius * 1.01 + 0.001
+    check_radius_sq = check_radius * check_radius
+    coords = index.coordinates
+    results = {}
+    for signal, neighbors in neighbor_lists.items():
+        ax, ay = coords(signal)
+        points = [coords(n) for n in neighbors]
+        unobstructed = []
+        for bi, b in enumerate(neighbors):
+            bx, by = points[bi]
+            dx, dy = bx - ax, by - ay
+            length_sq = dx * dx + dy * dy
+            min_x, max_x = min(ax, bx) - check_radius, max(ax, bx) + check_radius
+            min_y, max_y = min(ay, by) - check_radius, max(ay, by) + check_radius
+            obstructed = False
+            for oi, (ox, oy) in enumerate(points):
+                if oi == bi: continue
+                if ox < min_x or ox > max_x or oy < min_y or oy > max_y: continue
+                # squared distance from the obstacle to the segment
+                t = ((ox - ax) * dx + (oy - ay) * dy) / length_sq if length_sq > 0 else 0.0
+                t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+                cx, cy = ax + dx * t - ox, ay + dy * t - oy
+                if cx * cx + cy * cy > check_radius_sq: continue
+                # close enough to matter, let the exact test decide
+                if Intersecting.SegmentIntersectsCircleLenient(signal.Position, b.Position, neighbors[oi].Position, obstruction_radius):
+                    obstructed = True
+                    break
+            if not obstructed:
+                unobstructed.append(b)
+        results[signal] = unobstructed
+    return results
+
+class LinkValueTable:
+    """Memoized link values between pairs of planet types. Link value only depends on the types
+    of the two planets, so each pair is evaluated once (with two stand-in signals), and after
+    that the effect of any type swap is just a sum of lookups."""
+    def __init__(self, check_distance):
+        self._check_distance = check_distance
+        self._values = {}
+        self._probe_from = _LinkValueProbe(Vector2.zero)
+        self._probe_to = _LinkValueProbe(Vector2(check_distance * 0.5, 0))
+
+    def value(self, from_kind, to_kind):
+        """Link value added to a 'from_kind' planet by having a 'to_kind' planet as its neighbor."""
+        key = (from_kind, to_kind)
+        value = self._values.get(key, None)
+        if value is None:
+            self._probe_from.Contents, self._probe_to.Contents = from_kind, to_kind
+            value = sig_total_linkv2_value_with(self._probe_from, [self._probe_to], self._check_distance)
+            self._values[key] = value
+        return value
+
+class _LinkValueProbe:
+    def __init__(self, position):
+        self.Position = position
+        self.Contents = None
+
 def refinement_consistent_link_values_v2(target_lvpp_per_zone):
     """Tries to make planet combinations more consistent and fair by pulling
        the average 'link value' per planet in each zone to a target number."""
@@ -399,62 +495,53 @@ def refinement_consistent_link_values_v2(target_lvpp_per_zone):
     check_distance = constants.Float("slipway.range")
     distance_scale = constants.Float("distance.scale")
     obstruction_radius = constants.Float("planet.obstruction.radius")
+    link_values = LinkValueTable(check_distance) # shared by all runs, link values never change
     # logic
-    def refine(gen, signal, zones):
+    def refine(gen, signals, zones):
+        index = signal_index(gen, signals)
+        pair_value = link_values.value
         # neighbors cache
-        neighbors_cache = {}        
-        values_cache = {}
+        neighbors_cache = {}
+        neighbor_sets = {}
         # helpers
-        def obstructed(a, b, obstacles):
-            apos, bpos = a.Position, b.Position
-            for o in obstacles:                
-                if Intersecting.SegmentIntersectsCircleLenient(apos, bpos, o.Position, obstruction_radius) and o != a and o != b:
-                    return True
-            return False
+        def prefetch_neighbors(signals):
+            missing = dict((s, index.neighbors(s, check_distance, "planet.")) for s in signals if s not in neighbors_cache)
+            for s, unobstructed_ns in find_unobstructed_neighbors(index, missing, obstruction_radius).items():
+                neighbors_cache[s] = unobstructed_ns
+                neighbor_sets[s] = set(unobstructed_ns)
         def get_neighbors_for(signal):
             if not signal in neighbors_cache:
-                all_ns = [n for n in gen.Neighbors(signal, check_distance) if n.Contents.startswith("planet.")]                
-                unobstructed_ns = [n for n in all_ns if not obstructed(signal, n, all_ns)]       
-                neighbors_cache[signal] = unobstructed_ns
+                prefetch_neighbors([signal])
             return neighbors_cache[signal]
+        def is_neighbor_of(signal, other):
+            get_neighbors_for(other)
+            return signal in neighbor_sets[other]
         def get_total_link_value(signal):
-            if not signal in values_cache:
-                neighbors = get_neighbors_for(signal)
-                value = sig_total_linkv2_value_with(signal, neighbors, check_distance)
-                values_cache[signal] = value
-            return values_cache[signal]
-        def invalidate_caches(changed_node):
-            neighbors = get_neighbors_for(changed_node)
-            del values_cache[changed_node]
-            for n in neighbors:
-                del values_cache[n]
-        def assess_change_effect(signal, new_planet_type):
-            # get neighbors            
-            neighbors = get_neighbors_for(signal)
-            # calculate old link value
-            old_value = get_total_link_value(signal)
-            old_neighbors = sum(get_total_link_value(n) for n in neighbors)
-            # store old contents and swap them
-            old_contents = signal.Contents
-            signal.Contents = new_planet_type
-            # calculate the new link value for this signal
-            new_value = sig_total_linkv2_value_with(signal, neighbors, check_distance)
-            new_neighbors = sum(sig_total_linkv2_value_with(n, get_neighbors_for(n), check_distance) for n in neighbors)
-            # restore old state
-            signal.Contents = old_contents
-            # return global change
+            kind = signal.Contents
+            return sum(pair_value(kind, n.Contents) for n in get_neighbors_for(signal))
+        def assess_change_effects(signal, neighbor_kinds):
+            """Calculates the change in total link value for every possible new type of this planet,
+            using only table lookups. Links going out of the signal count toward its own value,
+            links coming in count toward the neighbors' values (obstruction can make these differ)."""
+            old_kind = signal.Contents
+            incoming_kinds = [n.Contents for n in get_neighbors_for(signal) if is_neighbor_of(signal, n)]
+            def value_as(kind):
+                return sum(pair_value(kind, k) for k in neighbor_kinds) + sum(pair_value(k, kind) for k in incoming_kinds)
+            old_value = value_as(old_kind)
             # THIS IS NOT ENTIRELY CORRECT, since the neighbors might belong to other zones
             # (thus not influencing our zone's total link value). We do count other-zone neighbors
             # here (despite it being technically incorrect), for performance and design reasons -
             # improving other-zone neighbors is almost as good as in-zone ones and much easier to track.
-            return new_value - old_value + new_neighbors - old_neighbors       
+            return dict((kind, value_as(kind) - old_value) for kind in planet_types if kind != old_kind)
         def total_link_value(signals):
-            return sum(sig_total_linkv2_value_with(s, get_neighbors_for(s), check_distance) for s in signals)
+            return sum(get_total_link_value(s) for s in signals)
         # actual logic
         zones = list(zones)
         zones.reverse() # work from the outside
         for zone in zones:
             planets = [p for p in zone.Signals if p.Contents.startswith("planet.")]
+            prefetch_neighbors(planets)
+            prefetch_neighbors(set(n for p in planets for n in neighbors_cache[p]))
             planet_count = len(planets)
             total_lv = total_link_value(planets)
             desired_lv = planet_count * target_lvpp_per_zone[zone.Index]
@@ -470,13 +557,15 @@ def refinement_consistent_link_values_v2(target_lvpp_per_zone):
                 desired_change = delta * desired_fraction
                 # look for the best possible change to make
                 best_change, best_error = (p.Contents, 0), abs(desired_change)
+                neighbor_kinds = [n.Contents for n in get_neighbors_for(p)]
+                effects = assess_change_effects(p, neighbor_kinds)
                 for potential_type in planet_types:
                     if potential_type == p.Contents: continue
-                    effect = assess_change_effect(p, potential_type)
+                    effect = effects[potential_type]
                     error = abs(desired_change - effect)
                     if error < best_error:
                         # increase error for repetitions and check again (we try to avoid too many repeated planet types)
-                        repeated_planet_types = sum(1 for n in get_neighbors_for(p) if n.Contents == potential_type)
+                        repeated_planet_types = neighbor_kinds.count(potential_type)
                         error += repeated_planet_types * 2
                         if error < best_error:
                             best_change, best_error = (potential_type, effect), error
@@ -486,8 +575,7 @@ def refinement_consistent_link_values_v2(target_lvpp_per_zone):
                     actual_effect = effect
                     gen_log("Changing %s[%s] -> %s, %.1f -> %.1f" % (p.Contents, p.Position * f(distance_scale), target_kind, total_lv, total_lv + actual_effect))
                     changes += 1
-                    p.Contents = target_kind
-                    invalidate_caches(p)
+                    index.set_contents(p, target_kind)
                     total_lv += actual_effect
             if GENERATION_LOGS:
                 final_total = total_link_value(planets)    
@@ -498,6 +586,13 @@ def refinement_consistent_link_values_v2(target_lvpp_per_zone):
 ####################################################
 # Guaranteeing a loop
 
+_loop_outcome = [None, None] # [generation, whether a loop was found]
+
+def loop_guarantee_outcome(gen):
+    """Whether refinement_ensure_loop() found a loop for this generation, None if it didn't run."""
+    outcome_gen, found = _loop_outcome
+    return found if outcome_gen is unwrap_generation(gen) else None
+
 def refinement_ensure_loop():
     replacements = [
         ("ice", "arctic"),
@@ -526,9 +621,22 @@ def refinement_ensure_loop():
         max_distance = constants.Float("map.loop_range")
         if max_distance <= 0:
             return
+        # FindViableLoop only depends on the planet types, and every speculative change is undone
+        # before the next one - so each state is the starting map plus at most one swapped planet,
+        # and states already known to have no loop don't need searching again. The extension
+        # search draws from the rng, so it always runs to keep the draws the same.
+        loopless_states = set()
+        loop_searches, cached_searches = 0, 0
         while (not loop_found) and (retries > 0):
             retries -= 1
-            loop = gen.FindViableLoop(zones[0], max_distance)
+            state = (last_speculation[0], last_speculation[0].Contents) if last_speculation else None
+            if state in loopless_states:
+                cached_searches += 1
+                loop = None
+            else:
+                loop_searches += 1
+                loop = gen.FindViableLoop(zones[0], max_distance)
+                if not loop: loopless_states.add(state)
             if not loop:
                 extension = gen.FindExtensionForViableLoop(rng, zones[0], 0.82)
                 if extension:
@@ -554,8 +662,11 @@ def refinement_ensure_loop():
                     last_speculation = (victim, replaced_kind)
             else:
                 loop_found = True                
-        if retries == 0:
-            log("Loop guarantee was not upheld.")
+        _loop_outcome[0], _loop_outcome[1] = unwrap_generation(gen), loop_found
+        if not loop_found:
+            log("Loop guarantee was not upheld (%d retries, %d loop searches, %d skipped as already searched)." % 
+                (100 - retries, loop_searches, cached_searches))
         else:
-            gen_log("Stable loop found.")
+            gen_log("Stable loop found (%d loop searches)." % loop_searches)
     return refine
+
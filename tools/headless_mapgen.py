@@ -0,0 +1,437 @@
+"""
+Headless map generation runner, used for tuning mapgen parameters outside the game.
+
+Runs StandardMapgen.on_map_setup() and every refinement/rule it registers against a pure-Python
+stand-in for the game's map generation API, for many seeds in parallel, and prints a compact
+per-zone table: planet counts, average link value per planet, station density and whether
+the loop guarantee held (as reported by the refinement itself). Seeds rejected on every attempt
+don't get rows, they're listed separately on stderr.
+
+The stand-in mirrors the API the scripts use (Neighbors, SignalsNear, RNGForTask, Refinement
+phases and so on), but the parts that live inside the engine - signal placement, how rule
+penalties are folded into weights, viable loop search - are approximations. Numbers coming out
+of this are good for comparing parameter sets against each other, not for exact reproduction
+of in-game sectors.
+
+The script files are loaded into one shared namespace, the same way the game does it. Link
+values come from sig_total_linkv2_value_with() in core/generation.py, which ships with the game
+install and is not part of this tree - point --scripts at the game's script folder (see
+tools/README.md). The runner refuses to start without it.
+
+Usage:
+    python tools/headless_mapgen.py --seeds 1000 --processes 8
+    python tools/headless_mapgen.py --seeds 200 --difficulty 2 --constant map.loop_range=1.6
+"""
+from __future__ import print_function
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "files")
+SCRIPT_FILES = [
+    "game_rules.py",
+    "core/utilities.py",
+    "core/generation.py",
+    "core/mapgen_support.py",
+    "modes/standard/mapgen.py",
+]
+# Defaults for the constants used during generation - override with --constant to match game.xls.
+DEFAULT_CONSTANTS = {
+    "slipway.range": 1.5,
+    "slipway.base_cost": 10.0,
+    "slipway.base_distance": 1.0,
+    "distance.scale": 1.0,
+    "planet.obstruction.radius": 0.25,
+    "map.difficulty": 0.0,
+    "map.loop_range": 1.5,
+}
+PHASES = ["after_sizes", "after_node_types", "after_planet_types"]
+MAX_REJECTIONS = 20
+
+#########################################################
+# Unity/engine value types
+
+class Vector2(object):
+    __slots__ = ("x", "y")
+    def __init__(self, x, y):
+        self.x, self.y = float(x), float(y)
+    def __add__(self, o): return Vector2(self.x + o.x, self.y + o.y)
+    def __sub__(self, o): return Vector2(self.x - o.x, self.y - o.y)
+    def __neg__(self): return Vector2(-self.x, -self.y)
+    def __mul__(self, k): return Vector2(self.x * k, self.y * k)
+    __rmul__ = __mul__
+    def __truediv__(self, k): return Vector2(self.x / k, self.y / k)
+    __div__ = __truediv__
+    def __repr__(self): return "(%.2f, %.2f)" % (self.x, self.y)
+    @property
+    def sqrMagnitude(self): return self.x * self.x + self.y * self.y
+    @property
+    def magnitude(self): return math.sqrt(self.sqrMagnitude)
+    @property
+    def normalized(self):
+        m = self.magnitude
+        return Vector2(self.x / m, self.y / m) if m > 1e-9 else Vector2(0, 0)
+    @staticmethod
+    def Dot(a, b): return a.x * b.x + a.y * b.y
+    @staticmethod
+    def Lerp(a, b, t):
+        t = min(1.0, max(0.0, t))
+        return a + (b - a) * t
+    @staticmethod
+    def LerpUnclamped(a, b, t): return a + (b - a) * t
+Vector2.zero = Vector2(0, 0)
+
+class PotentialSize(object):
+    Small, Medium, Big = "small", "medium", "big"
+
+class Constants(object):
+    def __init__(self, values):
+        self._values = values
+    def Float(self, name): return float(self._values[name])
+    def Int(self, name): return int(self._values[name])
+    def Distance(self, name): return float(self._values[name]) * float(self._values["distance.scale"])
+
+class Intersecting(object):
+    @staticmethod
+    def DistancePointToSegmentSquared(p, a, b):
+        ab = b - a
+        length_sq = ab.sqrMagnitude
+        t = 0.0 if length_sq <= 0 else max(0.0, min(1.0, Vector2.Dot(p - a, ab) / length_sq))
+        return (a + ab * t - p).sqrMagnitude
+    @staticmethod
+    def DistancePointToSegment(p, a, b):
+        return math.sqrt(Intersecting.DistancePointToSegmentSquared(p, a, b))
+    @staticmethod
+    def SegmentIntersectsCircleLenient(a, b, center, radius):
+        return Intersecting.DistancePointToSegmentSquared(center, a, b) < radius * radius
+    @staticmethod
+    def SegmentIntersectsCircleStrict(a, b, center, radius):
+        return Intersecting.DistancePointToSegmentSquared(center, a, b) <= radius * radius
+
+class Randomness(object):
+    @staticmethod
+    def SeededRNG(*parts): return random.Random("/".join(str(p) for p in parts))
+    @staticmethod
+    def Float(rng, low, high): return rng.uniform(low, high)
+    @staticmethod
+    def Int(rng, low, high): return rng.randint(low, high - 1)
+    @staticmethod
+    def WithProbability(rng, p): return rng.random() < p
+    @staticmethod
+    def Pick(rng, items): return rng.choice(list(items))
+    @staticmethod
+    def PickMany(rng, items, count): return rng.sample(list(items), int(count))
+    @staticmethod
+    def Shuffle(rng, items):
+        items = list(items)
+        rng.shuffle(items)
+        return items
+    @staticmethod
+    def PointOnUnitCircle(rng):
+        angle = rng.uniform(0, 2 * math.pi)
+        return Vector2(math.cos(angle), math.sin(angle))
+    @staticmethod
+    def PointInsideUnitCircle(rng):
+        return Randomness.PointOnUnitCircle(rng) * math.sqrt(rng.random())
+    @staticmethod
+    def PointInsideUnitRing(rng, inner):
+        return Randomness.PointOnUnitCircle(rng) * math.sqrt(rng.uniform(inner * inner, 1.0))
+
+#########################################################
+# Map generation stand-in
+
+class Signal(object):
+    def __init__(self, position):
+        self.Position = position
+        self.Size = None
+        self.Contents = "?"
+        self.Quirk = None
+    def __repr__(self): return "%s%s" % (self.Contents, self.Position)
+
+class Zone(object):
+    def __init__(self, index, inner, outer, center, count):
+        self.Index = index
+        self.inner, self.outer, self.center, self.count = inner, outer, center, count
+        self.Signals = []
+    def __repr__(self): return "Zone %d" % self.Index
+
+class Zones(object):
+    @staticmethod
+    def circle(center, ring_width, max_radius, point_counts):
+        return [Zone(i, i * ring_width, (i + 1) * ring_width, center, count) for i, count in enumerate(point_counts)]
+
+class LoopExtension(object):
+    """Shaped like the engine's result: victim.Signal is the planet to change, planetKind its new type."""
+    def __init__(self, signal, kind):
+        self.victim = type("LoopVictim", (), {"Signal": signal})()
+        self.planetKind = kind
+
+class GlobalCondition(object):
+    """Mapgen conditions only react to MapSetup, which the runner triggers itself."""
+    def react_to(self, trigger, handler, *args):
+        pass
+
+class HeadlessGeneration(object):
+    """Plays the part of the engine's map generator: places signals in zones, assigns sizes,
+    node types and planet types from weights adjusted by the registered rules, and runs the
+    refinements registered for each phase in priority order."""
+    def __init__(self, seed, attempt, namespace, seed_version = 2):
+        self.SeedVersion = seed_version
+        self._seed, self._attempt = seed, attempt
+        self._ns = namespace
+        self._zones, self._leeway = [], 0.2
+        self._signal_weights, self._node_weights, self._planet_weights = {}, {}, {}
+        self._rules = {"sizes": [], "nodes": [], "planets": []}
+        self._refinements = dict((phase, []) for phase in PHASES)
+        self._signals = []
+        self.rejected = False
+        self.neighbor_queries = 0
+
+    # --- configuration API
+
+    def ZoneGeneration(self, config):
+        self._zones = list(config["zones"])
+        self._leeway = config.get("distanceLeeway", 0.2)
+    def SignalWeights(self, weights): self._signal_weights = dict(weights)
+    def SignalRule(self, rule): self._rules["sizes"].append(rule)
+    def NodeWeights(self, size, weights): self._node_weights[size] = dict(weights)
+    def NodeRule(self, rule): self._rules["nodes"].append(rule)
+    def PlanetWeights(self, weights): self._planet_weights = dict(weights)
+    def PlanetRule(self, rule): self._rules["planets"].append(rule)
+    def Refinement(self, phase, priority, fn): self._refinements[phase].append((priority, len(self._refinements[phase]), fn))
+
+    # --- queries
+
+    def RNGForTask(self, task):
+        return random.Random("%s/%s/%s" % (self._seed, self._attempt, task))
+
+    def SignalsNear(self, point, radius):
+        self.neighbor_queries += 1
+        radius_sq = radius * radius
+        return [s for s in self._signals if (s.Position - point).sqrMagnitude <= radius_sq]
+
+    def Neighbors(self, signal, radius):
+        return [s for s in self.SignalsNear(signal.Position, radius) if s is not signal]
+
+    def CountNeighbors(self, signal, radius, tag = None):
+        return sum(1 for n in self.Neighbors(signal, radius) if tag is None or n.Contents == tag)
+
+    def HasNeighbor(self, signal, radius, tag):
+        return self.CountNeighbors(signal, radius, tag) > 0
+
+    def ProportionAmongNeighbors(self, signal, radius, tag):
+        neighbors = self.Neighbors(signal, radius)
+        return sum(1 for n in neighbors if n.Contents == tag) / float(len(neighbors)) if neighbors else 0.0
+
+    def RemoveSignal(self, signal): self.RemoveSignals([signal])
+    def RemoveSignals(self, signals):
+        removed = set(signals)
+        self._signals = [s for s in self._signals if s not in removed]
+        for z in self._zones:
+            z.Signals = [s for s in z.Signals if s not in removed]
+
+    def RejectThisMap(self): self.rejected = True
+
+    def FindViableLoop(self, zone, max_distance):
+        """Stand-in: a triangle of planets within max_distance of each other, each linking to both others."""
+        planets = [s for s in zone.Signals if s.Contents.startswith("planet.")]
+        max_sq = max_distance * max_distance
+        close = dict((p, [q for q in planets if q is not p and (q.Position - p.Position).sqrMagnitude <= max_sq]) for p in planets)
+        value = self._ns["LinkValueTable"](self._ns["constants"].Float("slipway.range")).value
+        def links(a, b): return value(a.Contents, b.Contents) > 0 and value(b.Contents, a.Contents) > 0
+        for a in planets:
+            for b in close[a]:
+                if not links(a, b): continue
+                for c in close[b]:
+                    if c is not a and c in close[a] and links(b, c) and links(c, a):
+                        return [a, b, c]
+        return None
+
+    def FindExtensionForViableLoop(self, rng, zone, threshold):
+        """Stand-in: the first single planet type change (victims in rng order) that makes FindViableLoop
+        succeed. The engine weighs candidate loops against 'threshold', this takes any loop it finds."""
+        planets = [s for s in zone.Signals if s.Contents.startswith("planet.")]
+        max_distance = self._ns["constants"].Float("map.loop_range")
+        kinds = sorted(self._planet_weights)
+        for victim in Randomness.Shuffle(rng, planets):
+            original = victim.Contents
+            for kind in kinds:
+                if kind == original: continue
+                victim.Contents = kind
+                found = self.FindViableLoop(zone, max_distance) is not None
+                victim.Contents = original
+                if found:
+                    return LoopExtension(victim, kind[len("planet."):])
+        return None
+
+    # --- the generation itself
+
+    def run(self):
+        self._place_signals()
+        self._assign("sizes", self._signals, lambda s: self._signal_weights, self._apply_size)
+        if self._refine("after_sizes"): return
+        self._assign("nodes", self._signals, lambda s: self._node_weights.get(s.Contents, {"nothing": 1}), self._apply_contents)
+        if self._refine("after_node_types"): return
+        planets = [s for s in self._signals if s.Contents == "planet.?"]
+        self._assign("planets", planets, lambda s: self._planet_weights, self._apply_contents)
+        self._refine("after_planet_types")
+
+    def _place_signals(self):
+        rng = self.RNGForTask("placement")
+        for zone in self._zones:
+            area = math.pi * (zone.outer ** 2 - zone.inner ** 2)
+            min_distance = math.sqrt(area / max(1, zone.count)) * (1 - self._leeway) * 0.7
+            placed = 0
+            for _ in range(zone.count * 30):
+                if placed == zone.count: break
+                radius = math.sqrt(rng.uniform(zone.inner ** 2, zone.outer ** 2))
+                angle = rng.uniform(0, 2 * math.pi)
+                pos = zone.center + Vector2(math.cos(angle) * radius, math.sin(angle) * radius)
+                if any((s.Position - pos).magnitude < min_distance for s in zone.Signals): continue
+                signal = Signal(pos)
+                zone.Signals.append(signal)
+                self._signals.append(signal)
+                placed += 1
+
+    def _assign(self, kind, signals, weights_for, apply):
+        rng = self.RNGForTask("assign_%s" % kind)
+        order = list(signals)
+        rng.shuffle(order)
+        for signal in order:
+            options = []
+            for tag, weight in weights_for(signal).items():
+                penalty = sum((rule(signal, tag, self) or 0) for rule in self._rules[kind])
+                options.append((tag, weight * math.exp(-penalty)))
+            total = sum(w for _, w in options)
+            roll = rng.uniform(0, total)
+            for tag, weight in options:
+                roll -= weight
+                if roll <= 0: break
+            apply(signal, tag)
+
+    def _apply_size(self, signal, tag):
+        signal.Size, signal.Contents = tag, tag
+
+    def _apply_contents(self, signal, tag):
+        signal.Contents = tag
+
+    def _refine(self, phase):
+        for _, _, fn in sorted(self._refinements[phase], key=lambda r: (r[0], r[1])):
+            fn(self, list(self._signals), self._zones)
+            if self.rejected: return True
+        return False
+
+#########################################################
+# Loading and running
+
+def build_namespace(scripts_root, constants):
+    missing = [script for script in SCRIPT_FILES if not os.path.exists(os.path.join(scripts_root, script))]
+    if missing:
+        raise RuntimeError("%s missing from %s - the runner needs the game's script folder, see tools/README.md." %
+            (", ".join(missing), os.path.abspath(scripts_root)))
+    ns = {
+        "__builtins__": __builtins__,
+        "math": math, "xrange": range,
+        "Vector2": Vector2, "PotentialSize": PotentialSize, "Intersecting": Intersecting,
+        "Randomness": Randomness, "Zones": Zones,
+        "constants": Constants(constants),
+        "f": float,
+        "log": lambda *args: None,
+        "GlobalCondition": GlobalCondition,
+        "Trigger": type("Trigger", (), {"MapSetup": "MapSetup"}),
+    }
+    for script in SCRIPT_FILES:
+        path = os.path.join(scripts_root, script)
+        with open(path) as source:
+            exec(compile(source.read(), path, "exec"), ns)
+    if "sig_total_linkv2_value_with" not in ns:
+        raise RuntimeError("sig_total_linkv2_value_with() not found in core/generation.py - is it the game's copy? See tools/README.md.")
+    # a placeholder generation.py produces all-zero link values and tables that look plausible otherwise
+    kinds = ["planet." + kind for kind in ["earthlike", "mining", "remnant", "ocean", "factory", "primordial"]]
+    link_values = ns["LinkValueTable"](constants["slipway.range"] * constants["distance.scale"])
+    if not any(link_values.value(a, b) for a in kinds for b in kinds):
+        raise RuntimeError("sig_total_linkv2_value_with() gives no link value for any planet pair - is core/generation.py the game's copy? See tools/README.md.")
+    return ns
+
+_worker = {}
+def init_worker(scripts_root, constants, hooks_name):
+    ns = build_namespace(scripts_root, constants)
+    _worker["ns"], _worker["hooks"] = ns, hooks_name
+
+def generate(seed):
+    """Returns (seed, rows) - rows is None if every attempt at the seed was rejected."""
+    ns = _worker["ns"]
+    for attempt in range(MAX_REJECTIONS):
+        gen = HeadlessGeneration(seed, attempt, ns)
+        mapgen = ns["StandardMapgen"](ns[_worker["hooks"]]())
+        mapgen.activate()
+        mapgen.on_map_setup({"generation": gen})
+        gen.run()
+        if not gen.rejected:
+            return seed, summarize(seed, attempt, gen, ns)
+    return seed, None
+
+def summarize(seed, rejections, gen, ns):
+    constants = ns["constants"]
+    check_distance = constants.Float("slipway.range")
+    index = ns["SignalIndex"](gen._signals)
+    link_values = ns["LinkValueTable"](check_distance)
+    loop = ns["loop_guarantee_outcome"](gen)
+    rows = []
+    for zone in gen._zones:
+        planets = [s for s in zone.Signals if s.Contents.startswith("planet.")]
+        neighbors = dict((p, index.neighbors(p, check_distance, "planet.")) for p in planets)
+        unobstructed = ns["find_unobstructed_neighbors"](index, neighbors, constants.Float("planet.obstruction.radius"))
+        total_lv = sum(link_values.value(p.Contents, n.Contents) for p in planets for n in unobstructed[p])
+        stations = sum(1 for s in zone.Signals if s.Contents == "structure.forebear_station")
+        rows.append((seed, zone.Index, len(zone.Signals), len(planets),
+            total_lv / max(1, len(planets)), stations / float(max(1, len(zone.Signals))), loop, rejections))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description = "Generate many standard sectors headlessly and tabulate zone statistics.")
+    parser.add_argument("--seeds", type = int, default = 100, help = "number of seeds to generate")
+    parser.add_argument("--first-seed", type = int, default = 1)
+    parser.add_argument("--processes", type = int, default = multiprocessing.cpu_count())
+    parser.add_argument("--scripts", default = ROOT, help = "root of the script folder (the one containing core/)")
+    parser.add_argument("--hooks", default = "MapgenDefaults", help = "class providing create_zones()")
+    parser.add_argument("--difficulty", type = float, default = None, help = "shortcut for --constant map.difficulty=X")
+    parser.add_argument("--constant", action = "append", default = [], metavar = "NAME=VALUE")
+    args = parser.parse_args()
+
+    constants = dict(DEFAULT_CONSTANTS)
+    for pair in args.constant:
+        name, value = pair.split("=", 1)
+        constants[name] = float(value)
+    if args.difficulty is not None:
+        constants["map.difficulty"] = args.difficulty
+
+    try:
+        build_namespace(args.scripts, constants) # fail early, a failing pool initializer would just respawn
+    except RuntimeError as e:
+        parser.error(str(e))
+    seeds = range(args.first_seed, args.first_seed + args.seeds)
+    pool = multiprocessing.Pool(args.processes, init_worker, (args.scripts, constants, args.hooks))
+    try:
+        print("seed\tzone\tsignals\tplanets\tlv/planet\tstations\tloop\trejections")
+        rejected_seeds = []
+        for seed, rows in pool.imap(generate, seeds, chunksize = 4):
+            if rows is None:
+                rejected_seeds.append(seed)
+                continue
+            for seed, zone, signals, planets, lvpp, stations, loop, rejections in rows:
+                loop = "n/a" if loop is None else ("yes" if loop else "no")
+                print("%d\t%d\t%d\t%d\t%.2f\t%.3f\t%s\t%d" % (seed, zone, signals, planets, lvpp, stations, loop, rejections))
+    finally:
+        pool.close()
+        pool.join()
+    if rejected_seeds:
+        print("%d of %d seeds rejected on all %d attempts: %s" % (len(rejected_seeds), args.seeds, MAX_REJECTIONS,
+            " ".join(str(seed) for seed in rejected_seeds)), file = sys.stderr)
+
+if __name__ == "__main__":
+    main()